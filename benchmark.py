@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+#
+#A Linux front-end for ZeroTier
+#Copyright (C) 2020  Tomás Ralph
+#
+#This program is free software: you can redistribute it and/or modify
+#it under the terms of the GNU General Public License as published by
+#the Free Software Foundation, either version 3 of the License, or
+#(at your option) any later version.
+#
+#This program is distributed in the hope that it will be useful,
+#but WITHOUT ANY WARRANTY; without even the implied warranty of
+#MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#GNU General Public License for more details.
+#
+#You should have received a copy of the GNU General Public License
+#along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# Measures how the data layer and the refresh paths of zerotier-gui
+# scale. Stand-in zerotier-cli and ip executables (or a stub of the
+# local API) serve generated networks, peers and paths, and every
+# operation is reported with its wall time, subprocess count, api
+# request count and the peak memory of the run.
+#
+# usage: benchmark.py --networks 50 --peers 5000 --paths 3 --output results.json
+
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib.util import spec_from_file_location, module_from_spec
+from json import dumps, loads
+from os import environ, chmod, pathsep
+from os.path import dirname, abspath, join
+from random import Random
+from resource import getrusage, RUSAGE_SELF, RUSAGE_CHILDREN
+from statistics import median
+from sys import executable, stderr
+from tempfile import TemporaryDirectory
+from threading import Thread, Lock
+from time import perf_counter, sleep
+
+FAKE_ZEROTIER_CLI = '''#!{python}
+import sys, json, os
+with open(os.environ["ZT_BENCH_COUNTER"], "a") as counter:
+	counter.write("zerotier-cli\\n")
+with open(os.environ["ZT_BENCH_DATA"]) as dataFile:
+	data = json.load(dataFile)
+arguments = [argument for argument in sys.argv[1:] if argument != "-j"]
+if arguments[0] == "listnetworks":
+	print(json.dumps(data["networks"]))
+elif arguments[0] == "peers":
+	print(json.dumps(data["peers"]))
+elif arguments[0] == "status":
+	print(json.dumps(data["status"]))
+else:
+	print("200 " + arguments[0] + " OK")
+'''
+
+FAKE_IP = '''#!{python}
+import sys, json, os
+with open(os.environ["ZT_BENCH_COUNTER"], "a") as counter:
+	counter.write("ip\\n")
+with open(os.environ["ZT_BENCH_DATA"]) as dataFile:
+	data = json.load(dataFile)
+if sys.argv[1:] == ["-j", "link"]:
+	print(json.dumps([{{"ifname": network["portDeviceName"], "operstate": "UNKNOWN"}}
+		for network in data["networks"]]))
+'''
+
+def generate(networkCount, peerCount, pathCount, seed=0):
+
+	random = Random(seed)
+
+	networks = []
+	for network in range(networkCount):
+		networks.append({
+			'id': f"{random.getrandbits(64):016x}",
+			'name': f"network-{network}",
+			'status': random.choice(("OK", "OK", "OK", "REQUESTING_CONFIGURATION")),
+			'type': "PRIVATE",
+			'portDeviceName': f"ztbench{network}",
+			'mac': "aa:bb:cc:dd:ee:ff",
+			'mtu': 2800,
+			'dhcp': False,
+			'bridge': False,
+			'broadcastEnabled': True,
+			'allowDefault': False,
+			'allowGlobal': False,
+			'allowManaged': True,
+			'allowDNS': False,
+			'assignedAddresses': [f"10.{network % 256}.0.1/16"],
+			'routes': []
+		})
+
+	peers = []
+	for peer in range(peerCount):
+		peers.append({
+			'address': f"{random.getrandbits(40):010x}",
+			'version': f"1.{random.randint(0, 12)}.{random.randint(0, 9)}",
+			'role': random.choice(("LEAF", "LEAF", "LEAF", "PLANET", "MOON")),
+			'latency': random.randint(-1, 400),
+			'isBonded': False,
+			'paths': [{
+				'active': random.random() > 0.2,
+				'address': f"{random.randint(1, 223)}.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}/9993",
+				'expired': False,
+				'lastReceive': random.getrandbits(40),
+				'lastSend': random.getrandbits(40),
+				'preferred': path == 0,
+				'trustedPathId': 0
+			} for path in range(pathCount)]
+		})
+
+	status = {'address': "89e92ceee5", 'version': "1.10.6", 'online': True}
+
+	return {'networks': networks, 'peers': peers, 'status': status}
+
+# networks of a self-hosted controller, network id -> {'network',
+# 'members' by member id}, every member at revision 1
+def generate_controller(networkCount, memberCount, seed=0):
+
+	random = Random(seed)
+
+	controller = {}
+	for network in range(networkCount):
+		networkId = f"{random.getrandbits(40):010x}{network:06x}"
+		members = {}
+		for member in range(memberCount):
+			memberId = f"{random.getrandbits(40):010x}"
+			members[memberId] = {
+				'id': memberId,
+				'address': memberId,
+				'nwid': networkId,
+				'name': f"member-{member}",
+				'authorized': False,
+				'activeBridge': False,
+				'noAutoAssignIps': False,
+				'ipAssignments': [],
+				'revision': 1
+			}
+		controller[networkId] = {
+			'network': {'id': networkId, 'name': f"controlled-{network}", 'private': True},
+			'members': members
+		}
+
+	return controller
+
+# data may also hold a 'controller' from generate_controller, served
+# under /controller with every member change bumping its revision.
+# 'delay' seconds are spent on every controller request, and the most
+# of them seen in flight at once is kept in stats['concurrent']. with a
+# 'token', requests without it get a 401. stats['connections'] counts
+# the connections accepted
+def start_stub_api(data):
+
+	requests = []
+	peersByAddress = {peer['address']: peer for peer in data['peers']}
+	controller = data.get('controller', {})
+	lock = Lock()
+	stats = {'inFlight': 0, 'concurrent': 0, 'connections': 0}
+
+	class Handler(BaseHTTPRequestHandler):
+
+		protocol_version = "HTTP/1.1"
+
+		def log_message(self, *arguments):
+			pass
+
+		def setup(self):
+			with lock:
+				stats['connections'] += 1
+			super().setup()
+
+		def authorized(self):
+			if data.get('token') and self.headers.get("X-ZT1-Auth") != data['token']:
+				self.rfile.read(int(self.headers.get("Content-Length", 0)))
+				self.reply({}, 401)
+				return False
+			return True
+
+		def reply(self, body, code=200):
+			body = dumps(body).encode()
+			self.send_response(code)
+			self.send_header("Content-Type", "application/json")
+			self.send_header("Content-Length", str(len(body)))
+			# headers and body in one write
+			self._headers_buffer.append(b"\r\n" + body)
+			self.flush_headers()
+
+		def controller_reply(self, method):
+
+			with lock:
+				stats['inFlight'] += 1
+				stats['concurrent'] = max(stats['concurrent'], stats['inFlight'])
+			try:
+				sleep(data.get('delay', 0))
+				body = loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+				parts = self.path.strip("/").split("/")[2:]
+				network = controller.get(parts[0]) if parts else None
+
+				if not parts:
+					self.reply(list(controller))
+				elif network is None:
+					self.reply({}, 404)
+				elif len(parts) == 1:
+					self.reply(network['network'])
+				elif len(parts) == 2 and parts[1] == "member":
+					self.reply({memberId: member['revision'] for memberId, member in network['members'].items()})
+				elif len(parts) == 3 and parts[2] in network['members']:
+					member = network['members'][parts[2]]
+					if method == "POST":
+						with lock:
+							member.update(body)
+							member['revision'] += 1
+					self.reply(member)
+				else:
+					self.reply({}, 404)
+			finally:
+				with lock:
+					stats['inFlight'] -= 1
+
+		def do_GET(self):
+			requests.append(self.path)
+			if not self.authorized():
+				return
+			if self.path.startswith("/controller/network"):
+				self.controller_reply("GET")
+			elif self.path == "/network":
+				self.reply(data['networks'])
+			elif self.path == "/peer":
+				self.reply(data['peers'])
+			elif self.path.startswith("/peer/") and self.path[6:] in peersByAddress:
+				self.reply(peersByAddress[self.path[6:]])
+			elif self.path == "/status":
+				self.reply(data['status'])
+			else:
+				self.reply({}, 404)
+
+		def do_POST(self):
+			requests.append(self.path)
+			if not self.authorized():
+				return
+			if self.path.startswith("/controller/network"):
+				self.controller_reply("POST")
+				return
+			self.rfile.read(int(self.headers.get("Content-Length", 0)))
+			self.reply({})
+
+		do_DELETE = do_POST
+
+	server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+	Thread(target=server.serve_forever, daemon=True).start()
+
+	server.stats = stats
+
+	return server, requests
+
+def load_zerotier_gui():
+	spec = spec_from_file_location("zerotier_gui", join(dirname(abspath(__file__)), "zerotier-gui.py"))
+	module = module_from_spec(spec)
+	spec.loader.exec_module(module)
+	return module
+
+def count_subprocesses(counterPath):
+	with open(counterPath) as counter:
+		return sum(1 for line in counter)
+
+# runs operation a few times, returns its timings and what it cost
+def measure(operation, repeats, counterPath, requests):
+
+	timings = []
+	subprocessesBefore = count_subprocesses(counterPath)
+	requestsBefore = len(requests)
+
+	for repeat in range(repeats):
+		start = perf_counter()
+		operation()
+		timings.append((perf_counter() - start) * 1000)
+
+	return {
+		'wall_ms': round(median(timings), 3),
+		'min_ms': round(min(timings), 3),
+		'max_ms': round(max(timings), 3),
+		'subprocesses': (count_subprocesses(counterPath) - subprocessesBefore) / repeats,
+		'api_requests': (len(requests) - requestsBefore) / repeats
+	}
+
+def data_layer_operations(zerotierGui, store, data):
+
+	networkIds = [network['id'] for network in data['networks']]
+	peerAddresses = [peer['address'] for peer in data['peers']]
+	devices = [network['portDeviceName'] for network in data['networks']]
+
+	operations = {
+		'networks': lambda: store.networks(maxAge=0),
+		'interface_states': lambda: zerotierGui.get_interface_states(devices),
+		'peers': lambda: store.peers(maxAge=0),
+		'status': lambda: store.status(maxAge=0),
+		'headless_networks': lambda: zerotierGui.headless_snapshot(store, "networks"),
+		'headless_peers': lambda: zerotierGui.headless_snapshot(store, "peers"),
+		'headless_paths': lambda: zerotierGui.headless_snapshot(store, "paths")
+	}
+
+	if networkIds:
+		operations['network_info'] = lambda: store.network(networkIds[0])
+	if peerAddresses:
+		operations['paths'] = lambda: store.peer(peerAddresses[0], maxAge=0)
+
+	return operations
+
+# drives the rendering side of MainWindow, needs a display (Xvfb works)
+def gui_operations(zerotierGui, store, api):
+
+	zerotierGui.load_tkinter()
+	mainWindow = zerotierGui.MainWindow(window=None, api=api, saveCache=False)
+	mainWindow.store = store
+	mainWindow.window.update()
+
+	peersWindow = zerotierGui.tk.Toplevel(mainWindow.window)
+	peerTable = zerotierGui.VirtualTable(peersWindow, columns=(
+		("ZT Address", 330), ("Version", 100), ("Role", 90), ("Latency", 80),
+		("History", 250), ("Min", 60), ("Avg", 60), ("P95", 60), ("Paths", 60)
+	))
+	peerTable.pack()
+
+	networkData = store.networks(maxAge=0)
+	peersData = store.peers(maxAge=0)
+	peerTable.filterText = peersData[0]['address'][:3] if peersData else ""
+
+	def render(function, *arguments):
+		def operation():
+			function(*arguments)
+			mainWindow.window.update_idletasks()
+		return operation
+
+	# wait for a real refresh through the backend engine, without
+	# the scheduler's debounce and rate limit
+	mainWindow.scheduler.delay = mainWindow.scheduler.minInterval = 0
+
+	def refresh_networks():
+		mainWindow.refresh_networks()
+		while mainWindow.scheduler.pending('networks'):
+			mainWindow.window.update()
+
+	return {
+		'gui_refresh_networks': refresh_networks,
+		'gui_show_networks': render(mainWindow.show_networks, networkData),
+		'gui_show_peers': render(mainWindow.show_peers, peerTable, peersData),
+		'gui_filter_peers': render(mainWindow.filter_peers, peerTable),
+		'gui_sort_peers': render(peerTable.sort_by, "Latency")
+	}
+
+if __name__ == "__main__":
+
+	parser = ArgumentParser(description="Benchmarks zerotier-gui against generated data")
+	parser.add_argument("--networks", type=int, default=20)
+	parser.add_argument("--peers", type=int, default=1000)
+	parser.add_argument("--paths", type=int, default=2, help="paths per peer")
+	parser.add_argument("--repeats", type=int, default=5)
+	parser.add_argument("--backend", choices=("api", "cli"), default="api",
+		help="serve data from a stub local api or from a fake zerotier-cli")
+	parser.add_argument("--ip-fallback", action="store_true",
+		help="read interface states with the fake ip instead of sysfs")
+	parser.add_argument("--gui", action="store_true",
+		help="also time the gui refresh paths, needs a display")
+	parser.add_argument("--output", help="write the results as json to this file")
+	arguments = parser.parse_args()
+
+	data = generate(arguments.networks, arguments.peers, arguments.paths)
+
+	with TemporaryDirectory() as directory:
+
+		dataPath = join(directory, "data.json")
+		counterPath = join(directory, "counter")
+		with open(dataPath, "w") as dataFile:
+			dataFile.write(dumps(data))
+		open(counterPath, "w").close()
+
+		# the stand-in executables go first on PATH
+		for name, script in (("zerotier-cli", FAKE_ZEROTIER_CLI), ("ip", FAKE_IP)):
+			with open(join(directory, name), "w") as scriptFile:
+				scriptFile.write(script.format(python=executable))
+			chmod(join(directory, name), 0o755)
+
+		environ['PATH'] = directory + pathsep + environ['PATH']
+		environ['ZT_BENCH_DATA'] = dataPath
+		environ['ZT_BENCH_COUNTER'] = counterPath
+
+		zerotierGui = load_zerotier_gui()
+		if arguments.ip_fallback:
+			zerotierGui.isdir = lambda path: False
+
+		server, requests = start_stub_api(data)
+		if arguments.backend == "api":
+			api = zerotierGui.ZeroTierAPI(port=server.server_address[1], token="benchmark")
+		else:
+			# nothing listens there, so every call falls back to zerotier-cli
+			server.shutdown()
+			server.server_close()
+			api = zerotierGui.ZeroTierAPI(port=server.server_address[1], token="benchmark")
+
+		store = zerotierGui.SnapshotStore(api)
+
+		operations = data_layer_operations(zerotierGui, store, data)
+		if arguments.gui:
+			operations.update(gui_operations(zerotierGui, store, api))
+
+		results = {}
+		for name, operation in operations.items():
+			results[name] = measure(operation, arguments.repeats, counterPath, requests)
+			print(f"{name:22s} {results[name]['wall_ms']:10.3f} ms  "
+				f"{results[name]['subprocesses']:5.1f} forks  "
+				f"{results[name]['api_requests']:5.1f} requests", file=stderr)
+
+	report = {
+		'parameters': {
+			'networks': arguments.networks,
+			'peers': arguments.peers,
+			'paths_per_peer': arguments.paths,
+			'repeats': arguments.repeats,
+			'backend': arguments.backend,
+			'ip_fallback': arguments.ip_fallback,
+			'gui': arguments.gui
+		},
+		'results': results,
+		# kilobytes on linux
+		'peak_rss_kb': {
+			'benchmark': getrusage(RUSAGE_SELF).ru_maxrss,
+			'subprocesses': getrusage(RUSAGE_CHILDREN).ru_maxrss
+		}
+	}
+
+	if arguments.output:
+		with open(arguments.output, "w") as outputFile:
+			outputFile.write(dumps(report, indent=4))
+	else:
+		print(dumps(report, indent=4))
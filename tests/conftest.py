@@ -0,0 +1,50 @@
+# zerotier-gui.py isn't importable by name, both it and the stub
+# api of benchmark.py are loaded from the repository root
+from os import environ
+from os.path import dirname, abspath
+from time import monotonic
+import sys
+
+import pytest
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import benchmark
+
+@pytest.fixture(scope="session")
+def zerotier_gui():
+	return benchmark.load_zerotier_gui()
+
+# processes events until done() or the timeout
+def wait_for(root, done, timeout=10):
+	deadline = monotonic() + timeout
+	while not done():
+		assert monotonic() < deadline, "timed out"
+		root.update()
+
+# a main window on a stub api, skipped without a display
+@pytest.fixture
+def main_window(zerotier_gui):
+
+	if not environ.get("DISPLAY"):
+		pytest.skip("no display")
+	zerotier_gui.load_tkinter()
+	try:
+		root = zerotier_gui.tk.Tk()
+	except zerotier_gui.tk.TclError:
+		pytest.skip("no display")
+	root.withdraw()
+
+	data = benchmark.generate(3, 50, 2)
+	server, requests = benchmark.start_stub_api(data)
+	api = zerotier_gui.ZeroTierAPI(port=server.server_address[1], token="token", cli=False)
+	mainWindow = zerotier_gui.MainWindow(window=root, api=api, linkWatch=False, saveCache=False)
+	wait_for(root, lambda: not mainWindow.scheduler.pending('networks'))
+
+	yield mainWindow, data
+
+	wait_for(root, lambda: not mainWindow.engine.pending)
+	mainWindow.engine.stop()
+	root.destroy()
+	server.shutdown()
+	server.server_close()
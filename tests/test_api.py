@@ -0,0 +1,121 @@
+# ZeroTierAPI against the stub api of benchmark.py, and against a raw
+# server for connections that are dropped or never answered
+from os import environ
+from socket import socket
+from threading import Thread
+from time import monotonic
+
+import pytest
+
+import benchmark
+
+@pytest.fixture
+def stub():
+	data = benchmark.generate(2, 5, 1)
+	data['token'] = "token"
+	server, requests = benchmark.start_stub_api(data)
+	yield data, server
+	server.shutdown()
+	server.server_close()
+
+# each accepted connection follows the next list of actions, one per
+# request: "answer" replies [], "hang" never does. the connection is
+# closed after its last action
+def raw_server(*connections):
+
+	listener = socket()
+	listener.bind(("127.0.0.1", 0))
+	listener.listen()
+
+	def serve(connection, actions):
+		with connection:
+			for action in actions:
+				request = b""
+				while b"\r\n\r\n" not in request:
+					chunk = connection.recv(4096)
+					if not chunk:
+						return
+					request += chunk
+				if action == "hang":
+					# until the client gives up
+					while connection.recv(4096):
+						pass
+					return
+				connection.sendall(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+					b"Content-Length: 2\r\n\r\n[]")
+
+	def accept():
+		for actions in connections:
+			connection, address = listener.accept()
+			Thread(target=serve, args=(connection, actions), daemon=True).start()
+
+	Thread(target=accept, daemon=True).start()
+	return listener
+
+def free_port():
+	with socket() as probe:
+		probe.bind(("127.0.0.1", 0))
+		return probe.getsockname()[1]
+
+def test_requests_share_one_connection(zerotier_gui, stub):
+	data, server = stub
+	api = zerotier_gui.ZeroTierAPI(port=server.server_address[1], token="token", cli=False)
+
+	assert [network['id'] for network in api.get_networks()] == [network['id'] for network in data['networks']]
+	api.get_status()
+	api.get_peers()
+	api.get_networks()
+
+	assert server.stats['connections'] == 1
+
+def test_wrong_token(zerotier_gui, stub):
+	data, server = stub
+	api = zerotier_gui.ZeroTierAPI(port=server.server_address[1], token="wrong", cli=False)
+
+	with pytest.raises(ConnectionError, match="missing authentication token"):
+		api.get_networks()
+
+def test_dropped_keep_alive_connection_is_retried(zerotier_gui):
+	listener = raw_server(["answer"], ["answer"])
+	api = zerotier_gui.ZeroTierAPI(port=listener.getsockname()[1], token="token", cli=False)
+
+	assert api.get_networks() == []
+	# the server closed the first connection after answering
+	assert api.get_networks() == []
+	listener.close()
+
+def test_timeout_is_not_retried(zerotier_gui):
+	listener = raw_server(["hang"], ["hang"])
+	api = zerotier_gui.ZeroTierAPI(port=listener.getsockname()[1], token="token", timeout=0.5, cli=False)
+
+	start = monotonic()
+	with pytest.raises(ConnectionError):
+		api.get_networks()
+	assert monotonic() - start < 0.9
+	listener.close()
+
+def test_timeout_on_a_reused_connection_is_not_retried(zerotier_gui):
+	listener = raw_server(["answer", "hang"], ["hang"])
+	api = zerotier_gui.ZeroTierAPI(port=listener.getsockname()[1], token="token", timeout=0.5, cli=False)
+
+	assert api.get_networks() == []
+	start = monotonic()
+	with pytest.raises(ConnectionError):
+		api.get_networks()
+	assert monotonic() - start < 0.9
+	listener.close()
+
+def test_falls_back_to_zerotier_cli(zerotier_gui, tmp_path, monkeypatch):
+	cli = tmp_path / "zerotier-cli"
+	cli.write_text("#!/bin/sh\necho '[{\"id\": \"8056c2e21c000001\"}]'\n")
+	cli.chmod(0o755)
+	monkeypatch.setenv("PATH", f"{tmp_path}:{environ.get('PATH', '')}")
+
+	# nothing listens there
+	port = free_port()
+	api = zerotier_gui.ZeroTierAPI(port=port, token="token")
+	assert api.get_networks() == [{'id': "8056c2e21c000001"}]
+
+	api = zerotier_gui.ZeroTierAPI(port=port, token="token", cli=False)
+	with pytest.raises(ConnectionError):
+		api.get_networks()
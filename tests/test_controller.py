@@ -0,0 +1,107 @@
+# Controller against the stub controller of benchmark.py
+from time import perf_counter
+
+import pytest
+
+import benchmark
+
+@pytest.fixture
+def stub():
+	data = {'networks': [], 'peers': [], 'status': {},
+		'controller': benchmark.generate_controller(1, 200)}
+	server, requests = benchmark.start_stub_api(data)
+	yield data, server, requests
+	server.shutdown()
+	server.server_close()
+
+@pytest.fixture
+def controller(zerotier_gui, stub):
+	data, server, requests = stub
+	api = zerotier_gui.ZeroTierAPI(port=server.server_address[1], token="token", cli=False)
+	return zerotier_gui.Controller(api)
+
+def member_fetches(requests):
+	return [path for path in requests if path.count("/") == 5]
+
+def test_networks(controller, stub):
+	data, server, requests = stub
+	networks = controller.networks()
+	assert [network['id'] for network in networks] == list(data['controller'])
+	assert networks[0]['memberCount'] == 200
+
+def test_refresh_only_fetches_changed_members(controller, stub):
+	data, server, requests = stub
+	networkId, network = next(iter(data['controller'].items()))
+
+	members = controller.refresh_members(networkId)
+	assert len(members) == 200
+	assert controller.fetched == 200
+
+	requests.clear()
+	again = controller.refresh_members(networkId)
+	assert controller.fetched == 0
+	assert member_fetches(requests) == []
+	# the same records, not new ones
+	assert all(old is new for old, new in zip(members, again))
+
+	# a member changed elsewhere and one that went away
+	changed, removed = list(network['members'])[:2]
+	network['members'][changed].update(name="renamed", revision=2)
+	del network['members'][removed]
+
+	requests.clear()
+	members = controller.refresh_members(networkId)
+	assert controller.fetched == 1
+	assert member_fetches(requests) == [f"/controller/network/{networkId}/member/{changed}"]
+	assert len(members) == 199
+	assert controller.members[networkId][changed].name == "renamed"
+
+def test_authorize_runs_concurrently(controller, stub):
+	data, server, requests = stub
+	networkId, network = next(iter(data['controller'].items()))
+	controller.refresh_members(networkId)
+	memberIds = list(network['members'])[:40]
+
+	data['delay'] = 0.02
+	start = perf_counter()
+	results = controller.authorize(networkId, memberIds)
+	elapsed = perf_counter() - start
+	data['delay'] = 0
+
+	assert not any(isinstance(result, Exception) for result in results.values())
+	assert server.stats['concurrent'] > 1
+	# one at a time would take 40 * 20 ms
+	assert elapsed < 0.4
+	assert all(network['members'][memberId]['authorized'] for memberId in memberIds)
+
+	# the answers already carry the new revisions
+	controller.refresh_members(networkId)
+	assert controller.fetched == 0
+	assert all(controller.members[networkId][memberId].authorized for memberId in memberIds)
+
+def test_authorize_reports_failures_per_member(controller, stub):
+	data, server, requests = stub
+	networkId, network = next(iter(data['controller'].items()))
+	memberId = next(iter(network['members']))
+
+	results = controller.authorize(networkId, [memberId, "ffffffffff"])
+	assert results[memberId]['authorized'] is True
+	assert isinstance(results["ffffffffff"], Exception)
+
+def test_set_ip_assignments(zerotier_gui, controller, stub):
+	data, server, requests = stub
+	networkId, network = next(iter(data['controller'].items()))
+	memberId = next(iter(network['members']))
+	controller.refresh_members(networkId)
+
+	controller.set_ip_assignments(networkId, memberId, ["10.0.0.5", "fd00::5"])
+	assert network['members'][memberId]['ipAssignments'] == ["10.0.0.5", "fd00::5"]
+	assert controller.members[networkId][memberId].ipAssignments == ("10.0.0.5", "fd00::5")
+
+	requests.clear()
+	for addresses in (["10.0.0.256"], ["10.0.0.5", "not an address"], ["10.0.0.0/24"]):
+		with pytest.raises(zerotier_gui.ZeroTierError):
+			controller.set_ip_assignments(networkId, memberId, addresses)
+	# nothing invalid reaches the controller
+	assert requests == []
+	assert network['members'][memberId]['ipAssignments'] == ["10.0.0.5", "fd00::5"]
@@ -0,0 +1,76 @@
+# BackendEngine and the RefreshScheduler on top of it, with a stand-in
+# window that runs after() callbacks when told to
+from time import monotonic
+
+import benchmark
+
+class Window:
+
+	def __init__(self):
+		self.callbacks = []
+		self.errors = []
+
+	def after(self, delay, function, *arguments):
+		self.callbacks.append((function, arguments))
+
+	def report_callback_exception(self, kind, error, traceback):
+		self.errors.append(error)
+
+	def run_until(self, done, timeout=5):
+		deadline = monotonic() + timeout
+		while not done():
+			assert monotonic() < deadline, "timed out"
+			while self.callbacks:
+				function, arguments = self.callbacks.pop(0)
+				function(*arguments)
+
+def test_failing_callback_doesnt_drop_the_others(zerotier_gui):
+
+	window = Window()
+	engine = zerotier_gui.BackendEngine(window)
+	results = []
+
+	def fail(result):
+		raise RuntimeError("widget is gone")
+
+	engine.submit({'first': lambda: 1}, fail)
+	engine.submit({'second': lambda: 2}, results.append)
+	window.run_until(lambda: not engine.pending)
+	engine.stop()
+
+	assert results == [{'second': 2}]
+	assert [str(error) for error in window.errors] == ["widget is gone"]
+
+def test_scheduler_tells_unchanged_fetches_apart(zerotier_gui):
+
+	data = benchmark.generate(2, 20, 1)
+	server, requests = benchmark.start_stub_api(data)
+	store = zerotier_gui.SnapshotStore(zerotier_gui.ZeroTierAPI(port=server.server_address[1], token="token", cli=False))
+
+	window = Window()
+	engine = zerotier_gui.BackendEngine(window)
+	scheduler = zerotier_gui.RefreshScheduler(engine, window, delay=0, minInterval=0)
+	changes = []
+	scheduler.register('peers', lambda: {'peers': lambda: store.peers(maxAge=0)},
+		lambda results: changes.append(scheduler.changed('peers')),
+		lambda results: store.versions['peers'])
+
+	def fetch():
+		count = len(changes)
+		scheduler.request('peers')
+		window.run_until(lambda: len(changes) > count)
+
+	fetch()
+	fetch()
+	data['peers'][3]['latency'] += 1
+	fetch()
+	data['peers'].pop()
+	fetch()
+	fetch()
+
+	engine.stop()
+	store.api.close()
+	server.shutdown()
+	server.server_close()
+
+	assert changes == [True, False, True, True, False]
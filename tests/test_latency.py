@@ -0,0 +1,31 @@
+# LatencySampler records on a worker while the gui reads the histories
+# it handed out before
+def peers(latencies):
+	return [{'address': f"{position:010x}", 'latency': latency,
+		'paths': [{'active': True}] if latency >= 0 else []} for position, latency in enumerate(latencies)]
+
+def test_handed_out_histories_stay_as_they_were(zerotier_gui):
+
+	sampler = zerotier_gui.LatencySampler(size=3)
+	assert sampler.record(peers([10, 20]))
+	shown = sampler.histories
+	shownValues = {address: (history.recent(3), history.average(), history.samples) for address, history in shown.items()}
+
+	for latencies in ([30, -1], [40, 50], [60, 70]):
+		assert sampler.record(peers(latencies))
+
+	assert {address: (history.recent(3), history.average(), history.samples)
+		for address, history in shown.items()} == shownValues
+	assert sampler.histories['0000000000'].recent(3) == [30, 40, 60]
+	assert sampler.histories['0000000001'].recent(3) == [-1, 50, 70]
+	assert sampler.histories['0000000001'].fewest_paths() == 0
+	assert sampler.recorded == 4
+
+def test_a_snapshot_is_recorded_once(zerotier_gui):
+
+	sampler = zerotier_gui.LatencySampler()
+	snapshot = peers([10])
+	assert sampler.record(snapshot)
+	assert not sampler.record(snapshot)
+	assert sampler.histories['0000000000'].samples == 1
+	assert sampler.recorded == 1
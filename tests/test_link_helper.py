@@ -0,0 +1,58 @@
+# the privileged helper started without pkexec, as the same user, which
+# is enough for its handshake and the requests it refuses
+from json import dumps, loads
+from os.path import dirname, abspath, join
+from socket import socket, AF_UNIX
+import sys
+
+import pytest
+
+SCRIPT = join(dirname(dirname(abspath(__file__))), "zerotier-gui.py")
+
+@pytest.fixture
+def helper(zerotier_gui):
+	helper = zerotier_gui.PrivilegedHelper([sys.executable, SCRIPT])
+	yield helper
+	helper.stop()
+
+def test_refuses_other_devices_and_states(zerotier_gui, helper):
+
+	results = helper.set_links([("lo", "down"), ("eth0", "up"), ("zt0/../lo", "up"), ("ztnotthere0", "up")])
+	assert all(isinstance(error, zerotier_gui.ZeroTierError) for error in results.values())
+	assert "isn't a ZeroTier device" in str(results['lo'])
+	assert "isn't a ZeroTier device" in str(results['ztnotthere0'])
+
+	results = helper.set_links([("ztnotthere0", "sideways")])
+	assert "Unknown state 'sideways'" in str(results['ztnotthere0'])
+
+	assert helper.send({'link': "ztnotthere0"}) == {'error': "Unknown state None"}
+	assert helper.send(["not", "a", "request"]) == {'error': "Bad request"}
+
+def test_needs_the_token(zerotier_gui, helper):
+
+	helper.set_links([])
+	# the socket name is the helper's last argument
+	name = helper.process.args[-1]
+
+	for first in ({'token': "wrong"}, {'link': "lo", 'state': "down"}, "token"):
+		with socket(AF_UNIX) as connection, connection.makefile("rwb") as stream:
+			connection.connect("\0" + name)
+			stream.write(dumps(first).encode() + b"\n")
+			stream.flush()
+			# hung up on without an answer
+			assert stream.readline() == b""
+
+	# the helper's own connection is still served
+	assert helper.send({'link': "lo", 'state': "down"}) == {'error': "'lo' isn't a ZeroTier device"}
+
+def test_started_again_after_dying(zerotier_gui, helper):
+
+	helper.set_links([])
+	first = helper.process
+	first.kill()
+	first.wait()
+
+	results = helper.set_links([("lo", "up")])
+	assert "isn't a ZeroTier device" in str(results['lo'])
+	assert helper.process is not first
+	assert helper.process.poll() is None
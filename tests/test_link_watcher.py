@@ -0,0 +1,75 @@
+# LinkWatcher fed canned netlink datagrams instead of a netlink socket
+from struct import pack
+
+RTM_NEWLINK = 16
+RTM_DELLINK = 17
+RTM_NEWADDR = 20
+IFF_UP = 1
+
+def attribute(kind, value):
+	data = pack("=HH", 4 + len(value), kind) + value
+	return data + b"\0" * (-len(data) % 4)
+
+# one link message, operstate is left out when None
+def message(kind, device, operstate=None, flags=0):
+	attributes = attribute(3, device.encode() + b"\0")
+	if operstate is not None:
+		attributes += attribute(16, bytes([operstate]))
+	body = pack("=BBHiII", 0, 0, 1, 7, flags, 0) + attributes
+	return pack("=IHHII", 16 + len(body), kind, 0, 0, 0) + body
+
+# hands out the datagrams, then stops the watcher like closing the socket
+class Source:
+
+	def __init__(self, datagrams):
+		self.datagrams = list(datagrams)
+		self.watcher = None
+
+	def recv(self, size):
+		if self.datagrams:
+			return self.datagrams.pop(0)
+		self.watcher.stop()
+		return b""
+
+def watch(zerotier_gui, datagrams, devices=None):
+	changes = []
+	source = Source(datagrams)
+	watcher = zerotier_gui.LinkWatcher(lambda device, state: changes.append((device, state)), source=source)
+	watcher.devices = devices
+	source.watcher = watcher
+	watcher.listen()
+	return changes
+
+def test_link_messages(zerotier_gui):
+
+	changes = watch(zerotier_gui, [
+		message(RTM_NEWLINK, "zt0", operstate=6),
+		# several messages in one datagram, the last without an operstate
+		message(RTM_NEWLINK, "zt0", operstate=2) + message(RTM_NEWADDR, "zt0") + message(RTM_NEWLINK, "zt1", flags=IFF_UP),
+		message(RTM_DELLINK, "zt1"),
+		# truncated, ignored
+		message(RTM_NEWLINK, "zt2", operstate=6)[:30],
+	])
+
+	assert changes == [("zt0", "UP"), ("zt0", "DOWN"), ("zt1", "UP"), ("zt1", "-")]
+
+def test_only_changes_are_reported(zerotier_gui):
+
+	changes = watch(zerotier_gui, [
+		message(RTM_NEWLINK, "zt0", operstate=6),
+		message(RTM_NEWLINK, "zt0", operstate=6),
+		message(RTM_NEWLINK, "zt0", flags=IFF_UP),
+		message(RTM_NEWLINK, "zt0", operstate=2),
+	])
+
+	assert changes == [("zt0", "UP"), ("zt0", "DOWN")]
+
+def test_device_filter(zerotier_gui):
+
+	changes = watch(zerotier_gui, [
+		message(RTM_NEWLINK, "eth0", operstate=6),
+		message(RTM_NEWLINK, "zt0", operstate=6) + message(RTM_NEWLINK, "zt1", operstate=6),
+		message(RTM_DELLINK, "zt1"),
+	], devices={"zt0"})
+
+	assert changes == [("zt0", "UP")]
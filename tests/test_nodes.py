@@ -0,0 +1,74 @@
+# the dashboard's node list and polling, against stub apis and nodes
+# that are down or never answer
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from socket import socket
+from time import monotonic
+
+import pytest
+
+import benchmark
+
+TIMEOUT = 1
+
+@pytest.fixture
+def stubs():
+	servers = []
+	for count in range(3):
+		data = benchmark.generate(count + 1, 10, 1)
+		server, requests = benchmark.start_stub_api(data)
+		servers.append((data, server))
+	yield servers
+	for data, server in servers:
+		server.shutdown()
+		server.server_close()
+
+def test_poll_nodes(zerotier_gui, stubs):
+
+	nodes = [zerotier_gui.Node(f"stub{position}", f"http://127.0.0.1:{server.server_address[1]}", "token", TIMEOUT)
+		for position, (data, server) in enumerate(stubs)]
+
+	# nothing listens on a closed port
+	with socket() as dead:
+		dead.bind(("127.0.0.1", 0))
+		deadPort = dead.getsockname()[1]
+	nodes.append(zerotier_gui.Node("dead", f"http://127.0.0.1:{deadPort}", "token", TIMEOUT))
+
+	# connections are accepted by the kernel but never answered
+	hung = socket()
+	hung.bind(("127.0.0.1", 0))
+	hung.listen()
+	nodes.append(zerotier_gui.Node("hung", f"http://127.0.0.1:{hung.getsockname()[1]}", "token", TIMEOUT))
+
+	executor = ThreadPoolExecutor(max_workers=len(nodes))
+	start = monotonic()
+	results = asyncio.run(zerotier_gui.poll_nodes(nodes, executor))
+	elapsed = monotonic() - start
+	executor.shutdown()
+	hung.close()
+
+	assert [result['name'] for result in results] == ["stub0", "stub1", "stub2", "dead", "hung"]
+	for result, (data, server) in zip(results, stubs):
+		assert 'error' not in result
+		assert result['status']['address'] == data['status']['address']
+		assert len(result['networks']) == len(data['networks'])
+		assert len(result['peers']) == len(data['peers'])
+	assert results[3]['error']
+	assert results[4]['error']
+
+	# the hung node holds up the poll for its timeout, not the others'
+	assert elapsed < TIMEOUT * 2
+
+def test_read_nodes_needs_nodes(zerotier_gui, tmp_path):
+	path = tmp_path / "nodes.json"
+	path.write_text("[]")
+	with pytest.raises(zerotier_gui.ZeroTierError, match="no nodes listed"):
+		zerotier_gui.read_nodes(str(path))
+
+def test_get_peer_without_cli(zerotier_gui):
+	with socket() as dead:
+		dead.bind(("127.0.0.1", 0))
+		port = dead.getsockname()[1]
+	api = zerotier_gui.ZeroTierAPI(port=port, token="token", cli=False)
+	with pytest.raises(ConnectionError):
+		api.get_peer("0123456789")
@@ -0,0 +1,78 @@
+# refreshes and saves of the same data as before are skipped.
+# needs a display, Xvfb works
+from conftest import wait_for
+
+# counts the calls of a MainWindow method
+def count_calls(mainWindow, name):
+	calls = []
+	method = getattr(mainWindow, name)
+	def counted(*arguments, **keywords):
+		calls.append(arguments)
+		return method(*arguments, **keywords)
+	setattr(mainWindow, name, counted)
+	return calls
+
+def refresh(mainWindow, kind):
+	mainWindow.scheduler.request(kind)
+	wait_for(mainWindow.window, lambda: not mainWindow.scheduler.pending(kind))
+
+def test_unchanged_networks(zerotier_gui, main_window):
+
+	mainWindow, data = main_window
+	renders = count_calls(mainWindow, 'show_networks')
+	saves = count_calls(mainWindow, 'schedule_save')
+
+	refresh(mainWindow, 'networks')
+	refresh(mainWindow, 'states')
+	assert not renders and not saves
+
+	data['networks'][0]['name'] = "renamed"
+	refresh(mainWindow, 'networks')
+	assert len(renders) == 1 and len(saves) == 1
+
+def test_unchanged_peers(zerotier_gui, main_window):
+
+	mainWindow, data = main_window
+	mainWindow.see_peers()
+	peerTable = mainWindow.subWindows['peers'].peerTable
+	wait_for(mainWindow.window, lambda: peerTable.rows and not mainWindow.scheduler.pending('peers'))
+
+	renders = count_calls(mainWindow, 'show_peers')
+	saves = count_calls(mainWindow, 'schedule_save')
+
+	refresh(mainWindow, 'peers')
+	assert not renders and not saves
+
+	data['peers'][0]['latency'] += 1
+	refresh(mainWindow, 'peers')
+	assert len(renders) == 1 and len(saves) == 1
+
+	# a hidden table misses nothing when shown again
+	mainWindow.hide_sub_window(mainWindow.subWindows['peers'])
+	data['peers'][0]['latency'] += 1
+	refresh(mainWindow, 'peers')
+	assert len(renders) == 1
+	mainWindow.see_peers()
+	wait_for(mainWindow.window, lambda: not mainWindow.scheduler.pending('peers'))
+	assert len(renders) == 2
+	assert peerTable.version == mainWindow.scheduler.versions['peers']
+
+def test_unchanged_snapshot_isnt_saved_again(zerotier_gui, main_window, monkeypatch):
+
+	mainWindow, data = main_window
+	saved = []
+	monkeypatch.setattr(zerotier_gui, "save_snapshot_cache", saved.append)
+
+	def save():
+		mainWindow.save_snapshot()
+		wait_for(mainWindow.window, lambda: not mainWindow.engine.pending)
+
+	save()
+	save()
+	assert len(saved) == 1
+
+	data['networks'][0]['name'] = "renamed"
+	refresh(mainWindow, 'networks')
+	save()
+	assert len(saved) == 2
+	assert saved[-1]['networks'][0]['name'] == "renamed"
@@ -0,0 +1,73 @@
+# the about, peers, paths and network info windows are built once and
+# then only shown and hidden. needs a display, Xvfb works
+from conftest import wait_for
+
+CYCLES = 500
+
+def widget_count(widget):
+	return sum(1 + widget_count(child) for child in widget.winfo_children())
+
+def toplevel_count(zerotier_gui, root):
+	return sum(isinstance(child, zerotier_gui.tk.Toplevel) for child in root.winfo_children())
+
+def test_sub_windows_are_reused(zerotier_gui, main_window):
+
+	mainWindow, data = main_window
+	root = mainWindow.window
+	network = mainWindow.store.network(data['networks'][0]['id'])
+
+	# the peers table needs rows to pick a peer for the paths window
+	mainWindow.see_peers()
+	peerTable = mainWindow.subWindows['peers'].peerTable
+	wait_for(root, lambda: peerTable.rows)
+	peerTable.selected = peerTable.rows[0][0]
+
+	# networks with up to three addresses, the most lines come first
+	addresses = [[f"10.0.0.{line}/24" for line in range(count)] for count in (3, 0, 1, 2)]
+
+	def cycle(position):
+
+		mainWindow.show_about_window(data['status'])
+		mainWindow.hide_sub_window(mainWindow.subWindows['about'])
+
+		mainWindow.see_peers()
+		mainWindow.see_peer_paths(peerTable)
+		# closed from the window manager this time
+		pathsWindow = mainWindow.subWindows['paths']
+		pathsWindow.tk.call(pathsWindow.protocol("WM_DELETE_WINDOW"))
+		mainWindow.hide_sub_window(mainWindow.subWindows['peers'])
+
+		network.update(dict(network.as_dict(), assignedAddresses=addresses[position % len(addresses)]))
+		mainWindow.show_network_info(network)
+		mainWindow.hide_sub_window(mainWindow.subWindows['info'])
+
+		root.update()
+
+	for position in range(len(addresses)):
+		cycle(position)
+	widgets = widget_count(root)
+	toplevels = toplevel_count(zerotier_gui, root)
+	assert toplevels == 4
+
+	for position in range(CYCLES):
+		cycle(position)
+		assert toplevel_count(zerotier_gui, root) == toplevels
+
+	assert widget_count(root) == widgets
+	assert len(mainWindow.peerTables) == 1
+	assert all(window.state() == "withdrawn" for window in mainWindow.subWindows.values())
+
+def test_reopened_window_shows_new_data(zerotier_gui, main_window):
+
+	mainWindow, data = main_window
+	networks = [mainWindow.store.network(network['id']) for network in data['networks'][:2]]
+
+	mainWindow.show_network_info(networks[0])
+	infoWindow = mainWindow.subWindows['info']
+	mainWindow.hide_sub_window(infoWindow)
+
+	mainWindow.show_network_info(networks[1])
+	assert mainWindow.subWindows['info'] is infoWindow
+	assert infoWindow.state() != "withdrawn"
+	assert infoWindow.networkId == networks[1].id
+	assert networks[1].id in infoWindow.fields['id'].get()
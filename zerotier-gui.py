@@ -23,23 +23,2645 @@
 #                                #
 ##################################
 
-import tkinter as tk
-from tkinter import messagebox
-from subprocess import check_output, STDOUT, CalledProcessError
-from json import loads
-from os import getuid, system, _exit
+# taken before anything else so startup timing covers the imports
+from time import perf_counter
+startTime = perf_counter()
+
+from time import monotonic, sleep, strftime
+from subprocess import check_output, Popen, STDOUT, PIPE, CalledProcessError
+from json import loads, dumps, JSONDecoder
+from codecs import getincrementaldecoder
+from os import getuid, system, listdir, _exit, environ, makedirs, replace, fdopen, unlink
+from os.path import expanduser, isdir, splitext, join, dirname, abspath, exists
+from tempfile import mkstemp
+from http.client import HTTPConnection, HTTPException, RemoteDisconnected
+from socket import socket, create_connection, AF_INET, AF_UNIX, SOCK_DGRAM, SOL_SOCKET, SO_PEERCRED, IPPROTO_TCP, TCP_NODELAY
+from struct import pack, unpack, unpack_from
+from secrets import token_hex
+from hmac import compare_digest
+from threading import Lock, Thread, Event, local
+from bisect import bisect_left, insort
+from ipaddress import ip_address
+from array import array
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from queue import Queue, Empty
+from argparse import ArgumentParser, SUPPRESS
+from functools import wraps
+from sys import stderr, stdin, exit, intern, executable, exc_info
+# only set by bundlers, for a build that is its own interpreter
+try:
+	from sys import frozen
+except ImportError:
+	frozen = False
 from webbrowser import open_new_tab
+import asyncio
 
-class MainWindow:
+# tkinter is only imported by the gui, so headless mode
+# works on machines without it and starts faster
+tk = messagebox = ttk = filedialog = simpledialog = None
+
+def load_tkinter():
+	global tk, messagebox, ttk, filedialog, simpledialog
+	import tkinter as tk
+	from tkinter import messagebox, ttk, filedialog, simpledialog
+
+class ZeroTierError(Exception):
+	pass
+
+# call counts, errors and latency histograms of backend calls and
+# redraws, plus how many subprocesses were started. cheap enough to
+# always be on
+class Metrics:
+
+	# upper bounds of the histogram buckets, in milliseconds
+	buckets = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float("inf"))
 
 	def __init__(self):
+		self.lock = Lock()
+		self.reset()
+
+	def reset(self):
+		with self.lock:
+			# name -> [count, errors, total ms, max ms, bucket counts]
+			self.operations = {}
+			self.subprocesses = {}
+			self.started = monotonic()
+
+	def record(self, name, elapsed, failed=False):
+
+		elapsed *= 1000
+		bucket = bisect_left(self.buckets, elapsed)
+
+		with self.lock:
+			operation = self.operations.get(name)
+			if operation is None:
+				operation = self.operations[name] = [0, 0, 0.0, 0.0, [0] * len(self.buckets)]
+			operation[0] += 1
+			operation[1] += failed
+			operation[2] += elapsed
+			operation[3] = max(operation[3], elapsed)
+			operation[4][bucket] += 1
+
+	def count_subprocess(self, program):
+		with self.lock:
+			self.subprocesses[program] = self.subprocesses.get(program, 0) + 1
+
+	# upper bound of the bucket the percentile falls in
+	def percentile(self, histogram, percent):
+		wanted = sum(histogram) * percent / 100
+		seen = 0
+		for bucket, count in zip(self.buckets, histogram):
+			seen += count
+			if count and seen >= wanted:
+				return bucket
+		return 0
+
+	def snapshot(self):
+		with self.lock:
+			return {
+				'uptime_s': round(monotonic() - self.started, 1),
+				'operations': {
+					name: {
+						'count': count,
+						'errors': errors,
+						'avg_ms': round(total / count, 3),
+						'max_ms': round(maximum, 3),
+						'p50_ms': self.percentile(histogram, 50),
+						'p95_ms': self.percentile(histogram, 95),
+						'histogram': {
+							"inf" if bucket == float("inf") else str(bucket): bucketCount
+							for bucket, bucketCount in zip(self.buckets, histogram)
+						}
+					}
+					for name, (count, errors, total, maximum, histogram) in self.operations.items()
+				},
+				'subprocesses': dict(self.subprocesses)
+			}
+
+metrics = Metrics()
+
+def instrumented(name):
+	def decorator(function):
+		@wraps(function)
+		def wrapper(*args, **kwargs):
+			start = perf_counter()
+			try:
+				result = function(*args, **kwargs)
+			except BaseException:
+				metrics.record(name, perf_counter() - start, failed=True)
+				raise
+			metrics.record(name, perf_counter() - start)
+			return result
+		return wrapper
+	return decorator
+
+# the peer and path fields anything here looks at
+PEER_FIELDS = ("address", "version", "role", "latency")
+PATH_FIELDS = ("active", "address", "expired", "lastReceive", "lastSend", "preferred", "trustedPathId")
+
+def compact_peer(peer):
+	compact = {field: peer.get(field) for field in PEER_FIELDS}
+	compact['paths'] = [{field: path.get(field) for field in PATH_FIELDS}
+		for path in peer.get('paths') or ()]
+	return compact
+
+# decodes a json array one element at a time while it's being read,
+# so only a single element and one chunk are ever held as text.
+# read(size) returns bytes, and b"" at the end
+def iter_json_array(read, chunkSize=65536):
+
+	decoder = JSONDecoder()
+	textDecoder = getincrementaldecoder("utf-8")()
+	whitespace = " \t\r\n"
+	numberCharacters = "0123456789.eE+-"
+
+	buffer = ""
+	position = 0
+	started = False
+	ended = False
+
+	while True:
+
+		# skip to the next element
+		while position < len(buffer) and buffer[position] in whitespace:
+			position += 1
+
+		if position < len(buffer):
+			character = buffer[position]
+			if not started:
+				if character != "[":
+					raise ValueError(f"expected a json array, got {buffer[position:position + 40]!r}")
+				started = True
+				position += 1
+				continue
+			if character == ",":
+				position += 1
+				continue
+			if character == "]":
+				# the rest is drained so a keep-alive connection stays usable
+				while read(chunkSize):
+					pass
+				return
+
+			try:
+				element, end = decoder.raw_decode(buffer, position)
+			except ValueError:
+				# most likely cut off by the chunk boundary
+				if ended:
+					raise
+			else:
+				# a number cut by the chunk boundary may go on in
+				# the next one, as "12" of "12345" or "1" of "1.5"
+				if ended or (end < len(buffer) and buffer[end] not in numberCharacters):
+					yield element
+					position = end
+					continue
+
+		if ended:
+			raise ValueError("json array ended early")
+
+		chunk = read(chunkSize)
+		if chunk:
+			buffer = buffer[position:] + textDecoder.decode(chunk)
+		else:
+			buffer = buffer[position:] + textDecoder.decode(b"", final=True)
+			ended = True
+		position = 0
+
+# peers decoded straight from a stream, each turned into whatever
+# convert makes of it, compact dicts by default
+def read_peers(read, convert=compact_peer):
+	return [convert(peer) for peer in iter_json_array(read)]
+
+# one record per network, peer and path, living as long as what it
+# describes and updated in place by every snapshot. fields are read as
+# attributes, or by name like the json they come from
+class Record:
+
+	__slots__ = ()
+	fields = ()
+	# fields whose strings repeat across records
+	interned = frozenset()
+
+	def __init__(self, data):
+		for field in self.fields:
+			setattr(self, field, None)
+		self.update(data)
+
+	def __getitem__(self, field):
+		try:
+			return getattr(self, field)
+		except AttributeError:
+			raise KeyError(field)
+
+	def get(self, field, default=None):
+		return getattr(self, field, default)
+
+	def __repr__(self):
+		return f"{type(self).__name__}({self.as_dict()!r})"
+
+	# takes the new values from a json dict, True if any changed
+	def update(self, data):
+		changed = False
+		for field in self.fields:
+			value = data.get(field)
+			if field in self.interned and value.__class__ is str:
+				value = intern(value)
+			if getattr(self, field) != value:
+				setattr(self, field, value)
+				changed = True
+		return changed
+
+	def as_dict(self):
+		return {field: getattr(self, field) for field in self.fields}
+
+class Path(Record):
+
+	__slots__ = PATH_FIELDS
+	fields = PATH_FIELDS
+
+class Peer(Record):
+
+	__slots__ = PEER_FIELDS + ("paths",)
+	fields = PEER_FIELDS
+	interned = frozenset(("version", "role"))
+
+	def __init__(self, data):
+		self.paths = []
+		super().__init__(data)
+
+	# paths keep their records too, matched by address
+	def update(self, data):
+		changed = super().update(data)
+
+		known = {path.address: path for path in self.paths}
+		paths = []
+		for pathData in data.get('paths') or ():
+			path = known.get(pathData.get('address'))
+			if path is None:
+				path = Path(pathData)
+				changed = True
+			elif path.update(pathData):
+				changed = True
+			paths.append(path)
+
+		if len(paths) != len(self.paths) or any(path is not old for path, old in zip(paths, self.paths)):
+			changed = True
+		self.paths = paths
+
+		return changed
+
+	def as_dict(self):
+		data = super().as_dict()
+		data['paths'] = [path.as_dict() for path in self.paths]
+		return data
+
+class Network(Record):
+
+	__slots__ = fields = ("id", "name", "status", "type", "portDeviceName", "mac", "mtu",
+		"dhcp", "bridge", "allowDefault", "allowGlobal", "allowManaged", "assignedAddresses")
+	interned = frozenset(("status", "type", "portDeviceName"))
+
+	def update(self, data):
+		data = dict(data, assignedAddresses=tuple(data.get('assignedAddresses') or ()))
+		return super().update(data)
+
+# a member of a network run by a self-hosted controller
+class Member(Record):
+
+	__slots__ = fields = ("id", "address", "name", "authorized", "revision", "ipAssignments",
+		"activeBridge", "noAutoAssignIps")
+
+	def update(self, data):
+		data = dict(data, ipAssignments=tuple(data.get('ipAssignments') or ()))
+		return super().update(data)
+
+# json.dumps default= for data holding records
+def record_data(value):
+	if isinstance(value, Record):
+		return value.as_dict()
+	if isinstance(value, tuple):
+		return list(value)
+	return str(value)
+
+# equal for equal data, records included
+def data_digest(data):
+	return hash(dumps(data, sort_keys=True, default=record_data))
+
+# talks to the local JSON API of zerotier-one over a single
+# keep-alive connection, falling back to zerotier-cli when
+# the service can't be reached that way
+class ZeroTierAPI:
+
+	# cli=False never falls back to zerotier-cli, for services
+	# that aren't the local one
+	def __init__(self, host="127.0.0.1", port=None, token=None, timeout=5, cli=True):
+
+		self.host = host
+		self.port = port if port else self.read_port()
+		self.token = token if token else self.read_token()
+		self.timeout = timeout
+		self.cli = cli
+		self.connection = None
+		self.lock = Lock()
+
+	@staticmethod
+	def read_port():
+		try:
+			with open("/var/lib/zerotier-one/zerotier-one.port") as portFile:
+				return int(portFile.read().strip())
+		except (OSError, ValueError):
+			return 9993
+
+	# same lookup order zerotier-cli uses
+	@staticmethod
+	def read_token():
+		for tokenPath in (expanduser("~/.zeroTierOneAuthToken"),
+			"/var/lib/zerotier-one/authtoken.secret"):
+			try:
+				with open(tokenPath) as tokenFile:
+					return tokenFile.read().strip()
+			except OSError:
+				continue
+		return None
+
+	def connect(self):
+		if self.connection is None:
+			self.connection = HTTPConnection(self.host, self.port, timeout=self.timeout)
+			self.connection.connect()
+			# requests are tiny, don't let nagle hold them back
+			self.connection.sock.setsockopt(IPPROTO_TCP, TCP_NODELAY, 1)
+		return self.connection
+
+	def close(self):
+		with self.lock:
+			if self.connection is not None:
+				self.connection.close()
+				self.connection = None
+
+	# parse, when given, reads a successful answer straight from
+	# the connection through the read function it's handed
+	@instrumented("api request")
+	def request(self, method, path, body=None, parse=None):
+
+		if self.token is None:
+			raise ConnectionError("missing authentication token")
+
+		headers = {"X-ZT1-Auth": self.token}
+		if body is not None:
+			body = dumps(body)
+			headers["Content-Type"] = "application/json"
+
+		with self.lock:
+			# the server may have dropped the idle connection, so a
+			# request failing that way on a reused one is retried once
+			# on a fresh one. anything else, like a timeout, is not
+			for attempt in range(2):
+				reused = self.connection is not None
+				try:
+					connection = self.connect()
+					connection.request(method, path, body=body, headers=headers)
+					response = connection.getresponse()
+					if parse is not None and 200 <= response.status < 300:
+						return parse(response.read)
+					data = response.read()
+					break
+				except ValueError:
+					# the answer wasn't read to the end
+					self.connection.close()
+					self.connection = None
+					raise
+				except (OSError, HTTPException) as error:
+					if self.connection is not None:
+						self.connection.close()
+						self.connection = None
+					dropped = reused and isinstance(error, (ConnectionResetError, BrokenPipeError, RemoteDisconnected))
+					if attempt or not dropped:
+						raise ConnectionError(f"could not reach {self.host}:{self.port}")
+
+		if response.status == 401:
+			raise ConnectionError("missing authentication token")
+		if response.status >= 400:
+			raise ZeroTierError(f"{response.status} {response.reason} {data.decode(errors='replace').strip()}".strip())
+
+		return loads(data) if data else None
+
+	def call(self, method, path, command, body=None):
+		try:
+			return self.request(method, path, body)
+		except ConnectionError:
+			if not self.cli:
+				raise
+			return self.run_cli(command)
+
+	# like call() for json answers, both the api and zerotier-cli
+	# output are handed to parse as they are read
+	def stream(self, path, command, parse):
+		try:
+			return self.request("GET", path, parse=parse)
+		except ConnectionError:
+			if not self.cli:
+				raise
+			return self.stream_cli(command, parse)
+
+	def stream_cli(self, command, parse):
+
+		metrics.count_subprocess('zerotier-cli')
+		process = Popen(['zerotier-cli'] + command, stdout=PIPE, stderr=STDOUT)
+
+		# the start of the output is kept for error messages
+		head = bytearray()
+		def read(size):
+			chunk = process.stdout.read(size)
+			if len(head) < 4096:
+				head.extend(chunk[:4096 - len(head)])
+			return chunk
+
+		try:
+			data = parse(read)
+		except ValueError as error:
+			data = error
+		finally:
+			while read(65536):
+				pass
+			process.stdout.close()
+			process.wait()
+
+		if process.returncode or isinstance(data, ValueError):
+			raise ZeroTierError(head.decode(errors="replace").strip())
+		return data
+
+	def run_cli(self, command):
+		metrics.count_subprocess('zerotier-cli')
+		try:
+			output = check_output(['zerotier-cli'] + command, stderr=STDOUT)
+		except CalledProcessError as error:
+			raise ZeroTierError(error.output.decode().strip())
+		if command[0] == '-j':
+			return loads(output)
+		return output.decode()
+
+	def get_networks(self):
+		return self.call("GET", "/network", ['-j', 'listnetworks'])
+
+	# peers only keep the fields that are shown, and are never
+	# held whole as raw json
+	def get_peers(self, convert=compact_peer):
+		return self.stream("/peer", ['-j', 'peers'], lambda read: read_peers(read, convert))
+
+	def get_peer(self, address):
+		try:
+			return compact_peer(self.request("GET", f"/peer/{address}"))
+		except ConnectionError:
+			if not self.cli:
+				raise
+			for peer in self.stream_cli(['-j', 'peers'], read_peers):
+				if peer['address'] == address:
+					return peer
+			raise ZeroTierError(f"Peer {address} not found")
+
+	def get_status(self):
+		return self.call("GET", "/status", ['-j', 'status'])
+
+	def join(self, network):
+		return self.call("POST", f"/network/{network}", ['join', network], body={})
+
+	def leave(self, network):
+		return self.call("DELETE", f"/network/{network}", ['leave', network])
+
+	def set_config(self, network, config, value):
+		# zerotier-cli only accepts int values
+		return self.call("POST", f"/network/{network}", ['set', network, f"{config}={int(value)}"],
+			body={config: bool(value)})
+
+# shared copy of what the service last reported, so windows read from
+# memory instead of asking again. entries expire after ttl seconds and
+# are dropped right away by anything that changes them
+class SnapshotStore:
+
+	def __init__(self, api, ttl=2):
+
+		self.api = api
+		self.ttl = ttl
+		# kind -> (fetch time, data)
+		self.snapshots = {}
+		self.locks = {kind: Lock() for kind in ('networks', 'peers', 'status')}
+
+		# the records of the latest snapshots, by id
+		self.networksById = {}
+		self.peersByAddress = {}
+		# kind -> bumped whenever its data changes, so two fetches
+		# can be told apart without comparing what they fetched
+		self.versions = dict.fromkeys(self.locks, 0)
+
+	def get(self, kind, fetch, maxAge=None):
+
+		if maxAge is None:
+			maxAge = self.ttl
+
+		# a caller arriving during a fetch waits for it and
+		# gets its result instead of fetching again
+		requested = monotonic()
+		with self.locks[kind]:
+			snapshot = self.snapshots.get(kind)
+			if snapshot is not None and (snapshot[0] >= requested or monotonic() - snapshot[0] <= maxAge):
+				return snapshot[1]
+
+			data = self.index(kind, fetch())
+			self.snapshots[kind] = (monotonic(), data)
+
+			return data
+
+	# networks and peers become the records already known for
+	# them, updated in place, and records that went away are dropped
+	def index(self, kind, data):
+		if kind == 'networks':
+			data = [self.network_record(network) for network in data]
+			networksById = {network.id: network for network in data}
+			if list(networksById) != list(self.networksById):
+				self.versions[kind] += 1
+			self.networksById = networksById
+		elif kind == 'peers':
+			data = [self.peer_record(peer) for peer in data]
+			peersByAddress = {peer.address: peer for peer in data}
+			if list(peersByAddress) != list(self.peersByAddress):
+				self.versions[kind] += 1
+			self.peersByAddress = peersByAddress
+		else:
+			snapshot = self.snapshots.get(kind)
+			if snapshot is None or snapshot[1] != data:
+				self.versions[kind] += 1
+		return data
+
+	def network_record(self, data):
+		if isinstance(data, Network):
+			return data
+		network = self.networksById.get(data['id'])
+		if network is None:
+			return Network(data)
+		if network.update(data):
+			self.versions['networks'] += 1
+		return network
+
+	def peer_record(self, data):
+		if isinstance(data, Peer):
+			return data
+		peer = self.peersByAddress.get(data['address'])
+		if peer is None:
+			return Peer(data)
+		if peer.update(data):
+			self.versions['peers'] += 1
+		return peer
+
+	# stores data fetched some other way as the latest snapshot
+	def seed(self, kind, data):
+		with self.locks[kind]:
+			self.snapshots[kind] = (monotonic(), self.index(kind, data))
+
+	def invalidate(self, *kinds):
+		for kind in kinds:
+			self.snapshots.pop(kind, None)
+
+	# kind -> data of every snapshot held
+	def export(self):
+		return {kind: snapshot[1] for kind, snapshot in list(self.snapshots.items())}
+
+	def networks(self, maxAge=None):
+		return self.get('networks', self.api.get_networks, maxAge)
+
+	# peers are turned into records while they're being read
+	def peers(self, maxAge=None):
+		return self.get('peers', lambda: self.api.get_peers(self.peer_record), maxAge)
+
+	def status(self, maxAge=None):
+		return self.get('status', self.api.get_status, maxAge)
+
+	def network(self, networkId, maxAge=None):
+		self.networks(maxAge)
+		try:
+			return self.networksById[networkId]
+		except KeyError:
+			raise ZeroTierError(f"Not a member of network {networkId}")
+
+	# fresh paths only need the one peer, not the whole table
+	def peer(self, address, maxAge=None):
+
+		if maxAge is None:
+			maxAge = self.ttl
+
+		snapshot = self.snapshots.get('peers')
+		if snapshot is not None and monotonic() - snapshot[0] <= maxAge:
+			peer = self.peersByAddress.get(address)
+			if peer is not None:
+				return peer
+
+		return self.peer_record(self.api.get_peer(address))
+
+	@instrumented("join")
+	def join(self, network):
+		try:
+			return self.api.join(network)
+		finally:
+			self.invalidate('networks')
+
+	@instrumented("leave")
+	def leave(self, network):
+		try:
+			return self.api.leave(network)
+		finally:
+			self.invalidate('networks')
+
+	# returns the network as the service has it after the change.
+	# callers changing many networks refresh once at the end instead,
+	# with confirm=False they get the service's answer as it is
+	@instrumented("set")
+	def set_config(self, network, config, value, confirm=True):
+		try:
+			data = self.api.set_config(network, config, value)
+		finally:
+			self.invalidate('networks')
+
+		# the api answers with the network, zerotier-cli doesn't
+		if isinstance(data, dict) and data.get('id') == network:
+			return self.network_record(data)
+		if not confirm:
+			return data
+		return self.network(network, maxAge=0)
+
+# returns a dict of device name -> state ("UP", "DOWN", "UNKNOWN"...)
+# for the given devices, or for every device if none are given
+def get_interface_states(interfaces=None):
+
+	# no sysfs, ask ip for every link at once
+	if not isdir("/sys/class/net"):
+		metrics.count_subprocess('ip')
+		links = loads(check_output(['ip', '-j', 'link']))
+		linkStates = {link['ifname']: link.get('operstate', "-") for link in links}
+
+		if interfaces is None:
+			return linkStates
+		return {interface: linkStates.get(interface, "-") for interface in interfaces}
+
+	if interfaces is None:
+		interfaces = listdir("/sys/class/net")
+
+	states = {}
+	for interface in interfaces:
+		try:
+			with open(f"/sys/class/net/{interface}/operstate") as stateFile:
+				states[interface] = stateFile.read().strip().upper()
+		except OSError:
+			states[interface] = "-"
+
+	return states
+
+# reports link state changes of network devices as they happen, by
+# listening to the kernel's RTMGRP_LINK netlink group. where netlink
+# isn't available the devices are polled through sysfs instead.
+# callback(device, state) is called from the watcher's own thread
+class LinkWatcher:
+
+	NETLINK_ROUTE = 0
+	RTMGRP_LINK = 1
+	RTM_NEWLINK = 16
+	RTM_DELLINK = 17
+	IFLA_IFNAME = 3
+	IFLA_OPERSTATE = 16
+	IFF_UP = 1
+	# RFC 2863 states, as numbered by the kernel
+	OPERSTATES = ("UNKNOWN", "NOTPRESENT", "DOWN", "LOWERLAYERDOWN", "TESTING", "DORMANT", "UP")
+
+	# source is anything with a socket-like recv(), netlink is used
+	# when none is given
+	def __init__(self, callback, source=None, pollInterval=2):
+		self.callback = callback
+		self.source = source
+		self.pollInterval = pollInterval
+		# devices to report, None reports every device
+		self.devices = None
+		self.states = {}
+		self.stopped = Event()
+		self.polling = False
+
+	def start(self):
+
+		if self.source is None:
+			try:
+				from socket import AF_NETLINK, SOCK_RAW
+				self.source = socket(AF_NETLINK, SOCK_RAW, self.NETLINK_ROUTE)
+				self.source.bind((0, self.RTMGRP_LINK))
+			except (ImportError, OSError):
+				self.source = None
+
+		self.polling = self.source is None
+		target = self.poll if self.polling else self.listen
+		Thread(target=target, daemon=True).start()
+
+	def stop(self):
+		self.stopped.set()
+		if hasattr(self.source, "close"):
+			self.source.close()
+
+	def report(self, device, state):
+		if self.devices is not None and device not in self.devices:
+			return
+		if self.states.get(device) != state:
+			self.states[device] = state
+			self.callback(device, state)
+
+	def listen(self):
+
+		while not self.stopped.is_set():
+			try:
+				data = self.source.recv(65536)
+			except OSError:
+				data = b""
+			if not data:
+				break
+			for device, state in self.parse(data):
+				self.report(device, state)
+
+		# the socket went away without being stopped
+		if not self.stopped.is_set():
+			self.polling = True
+			self.poll()
+
+	def poll(self):
+		while not self.stopped.wait(self.pollInterval):
+			devices = self.devices
+			for device, state in get_interface_states(list(devices) if devices is not None else None).items():
+				self.report(device, state)
+
+	# yields (device, state) for every link message in a netlink datagram
+	@classmethod
+	def parse(cls, data):
+
+		offset = 0
+		while offset + 16 <= len(data):
+
+			# struct nlmsghdr
+			length, messageType, flags, sequence, pid = unpack_from("=IHHII", data, offset)
+			if length < 16 or offset + length > len(data):
+				break
+
+			if messageType in (cls.RTM_NEWLINK, cls.RTM_DELLINK) and length >= 32:
+
+				# struct ifinfomsg
+				family, padding, deviceType, index, deviceFlags, change = unpack_from("=BBHiII", data, offset + 16)
+
+				device = None
+				operstate = None
+
+				# struct rtattr list
+				position = offset + 32
+				while position + 4 <= offset + length:
+					attributeLength, attributeType = unpack_from("=HH", data, position)
+					if attributeLength < 4:
+						break
+					value = data[position + 4:position + attributeLength]
+					if attributeType == cls.IFLA_IFNAME:
+						device = value.rstrip(b"\0").decode(errors="replace")
+					elif attributeType == cls.IFLA_OPERSTATE and value:
+						operstate = value[0]
+					position += (attributeLength + 3) & ~3
+
+				if device is not None:
+					if messageType == cls.RTM_DELLINK:
+						state = "-"
+					elif operstate is not None and operstate < len(cls.OPERSTATES):
+						state = cls.OPERSTATES[operstate]
+					else:
+						state = "UP" if deviceFlags & cls.IFF_UP else "DOWN"
+					yield device, state
+
+			offset += (length + 3) & ~3
+
+# ZeroTier names its devices zt followed by letters and digits
+def is_zerotier_device(device):
+	return (isinstance(device, str) and device.startswith("zt") and device.isalnum()
+		and len(device) <= 15 and exists(f"/sys/class/net/{device}"))
+
+# brings a device up or down the way ip link does, without forking it
+def set_link_state(device, up):
+
+	from fcntl import ioctl
+	SIOCGIFFLAGS = 0x8913
+	SIOCSIFFLAGS = 0x8914
+	IFF_UP = 1
+
+	with socket(AF_INET, SOCK_DGRAM) as control:
+		# struct ifreq, the name followed by the flags
+		name, flags = unpack_from("16sH", ioctl(control, SIOCGIFFLAGS, pack("16sH22x", device.encode(), 0)))
+		flags = flags | IFF_UP if up else flags & ~IFF_UP
+		ioctl(control, SIOCSIFFLAGS, pack("16sH22x", device.encode(), flags))
+
+# the privileged side of PrivilegedHelper. it listens on an abstract
+# unix socket and only serves connections from allowedUid that first
+# send the token, and only ever brings ZeroTier devices up or down.
+# requests and answers are json lines
+class LinkHelper:
+
+	def __init__(self, name, token, allowedUid, setLink=set_link_state, isDevice=is_zerotier_device):
+		self.name = name
+		self.token = token
+		self.allowedUid = allowedUid
+		self.setLink = setLink
+		self.isDevice = isDevice
+		self.server = None
+
+	def listen(self):
+		self.server = socket(AF_UNIX)
+		self.server.bind("\0" + self.name)
+		self.server.listen()
+
+	def serve(self):
+		while True:
+			try:
+				connection, address = self.server.accept()
+			except OSError:
+				return
+			Thread(target=self.handle, args=(connection,), daemon=True).start()
+
+	def stop(self):
+		if self.server is not None:
+			self.server.close()
+
+	def handle(self, connection):
+
+		with connection, connection.makefile("rwb") as stream:
+
+			pid, uid, gid = unpack("3i", connection.getsockopt(SOL_SOCKET, SO_PEERCRED, 12))
+			if uid != self.allowedUid:
+				return
+
+			authenticated = False
+			for line in stream:
+				try:
+					request = loads(line)
+				except ValueError:
+					return
+
+				if not authenticated:
+					# the first line has to be the token
+					authenticated = isinstance(request, dict) and compare_digest(str(request.get('token', "")), self.token)
+					if not authenticated:
+						return
+					reply = {'ok': True}
+				else:
+					reply = self.run(request)
+
+				stream.write(dumps(reply).encode() + b"\n")
+				stream.flush()
+
+	def run(self, request):
+
+		if not isinstance(request, dict):
+			return {'error': "Bad request"}
+
+		device = request.get('link')
+		state = request.get('state')
+		if state not in ("up", "down"):
+			return {'error': f"Unknown state {state!r}"}
+		if not self.isDevice(device):
+			return {'error': f"{device!r} isn't a ZeroTier device"}
+
+		try:
+			self.setLink(device, state == "up")
+		except OSError as error:
+			return {'error': f"{device}: {error.strerror or error}"}
+		return {'ok': True}
+
+# runs as root through pkexec: reads the token from stdin, says ready
+# on stdout and serves until stdin closes, which happens when the gui
+# that started it exits
+def run_link_helper(name):
+
+	token = stdin.readline().strip()
+	if not token:
+		return 1
+
+	helper = LinkHelper(name, token, int(environ.get("PKEXEC_UID", getuid())))
+	helper.listen()
+	Thread(target=helper.serve, daemon=True).start()
+
+	print("ready", flush=True)
+	stdin.read()
+	helper.stop()
+
+	return 0
+
+# gui side of the link helper. it's started on first use, so only the
+# first link change asks for a password and later ones are a message
+# over an already open socket. command is what starts the helper, so an
+# unprivileged stand-in can be used instead of pkexec
+class PrivilegedHelper:
+
+	def __init__(self, command=None):
+		if command is None:
+			if frozen:
+				command = ['pkexec', executable]
+			else:
+				command = ['pkexec', executable, abspath(__file__)]
+		self.command = command
+		self.process = None
+		self.stream = None
+		self.lock = Lock()
+
+	def start(self):
+
+		name = f"zerotier-gui-{token_hex(8)}"
+		token = token_hex(32)
+
+		metrics.count_subprocess(self.command[0])
+		self.process = Popen(self.command + ['--link-helper', name], stdin=PIPE, stdout=PIPE)
+		# stdin stays open for as long as the helper should live
+		self.process.stdin.write(token.encode() + b"\n")
+		self.process.stdin.flush()
+
+		# the password prompt happens here
+		if self.process.stdout.readline().strip() != b"ready":
+			self.process.wait()
+			self.process = None
+			raise ZeroTierError("The privileged helper didn't start")
+
+		connection = socket(AF_UNIX)
+		connection.connect("\0" + name)
+		self.stream = connection.makefile("rwb")
+		connection.close()
+		self.send({'token': token})
+
+	def stop(self):
+		with self.lock:
+			if self.stream is not None:
+				self.stream.close()
+				self.stream = None
+			if self.process is not None:
+				self.process.stdin.close()
+				self.process.wait()
+				self.process = None
+
+	# forgets a helper that went away, so the next use starts another
+	def discard(self):
+		if self.stream is not None:
+			try:
+				self.stream.close()
+			except OSError:
+				# the unsent request can't be flushed to a dead helper
+				pass
+			self.stream = None
+		if self.process is not None:
+			self.process.stdin.close()
+			self.process.stdout.close()
+			self.process.wait()
+			self.process = None
+
+	def send(self, request):
+		self.stream.write(dumps(request).encode() + b"\n")
+		self.stream.flush()
+		reply = self.stream.readline()
+		if not reply:
+			raise ConnectionError("The privileged helper went away")
+		return loads(reply)
+
+	# changes is a list of (device, "up" or "down"), returns
+	# device -> None or the error it failed with
+	@instrumented("privileged helper")
+	def set_links(self, changes):
+
+		with self.lock:
+			# started again if it died since the last time
+			for attempt in range(2):
+				try:
+					if self.stream is None:
+						self.start()
+					results = {}
+					for device, state in changes:
+						reply = self.send({'link': device, 'state': state})
+						results[device] = ZeroTierError(reply['error']) if 'error' in reply else None
+					return results
+				except (OSError, ValueError):
+					self.discard()
+					if attempt:
+						raise ZeroTierError("Lost the privileged helper")
+
+# networks as a list of (id, record) tuples
+def network_records(networkData, interfaceStates):
+
+	networks = []
+
+	for network in networkData:
+
+		interfaceState = interfaceStates.get(network['portDeviceName'], "-")
+
+		if interfaceState.lower() == "down":
+			isDown = True
+		else:
+			isDown = False
+
+		networks.append((network['id'], (
+			network['id'],
+			network['name'],
+			network['status'],
+			isDown
+		)))
+
+	return networks
+
+# paths of a peer as a list of (address, record) tuples
+def path_records(pathsData):
+
+	paths = []
+
+	for path in pathsData:
+		paths.append((path['address'], (
+			path['active'],
+			path['address'],
+			path['expired'],
+			path['lastReceive'],
+			path['lastSend'],
+			path['preferred'],
+			path['trustedPathId']
+		)))
+
+	return paths
+
+def peer_version(version):
+	if version == "-1.-1.-1":
+		return "-"
+	return version
+
+def network_name(name):
+	if not name:
+		return "No name"
+	return name
+
+# plain text table with columns as wide as their widest value
+def format_table(headers, rows):
+
+	rows = [[str(value) for value in row] for row in rows]
+	widths = [max([len(header)] + [len(row[column]) for row in rows])
+		for column, header in enumerate(headers)]
+
+	lines = ["  ".join(header.ljust(width) for header, width in zip(headers, widths)).rstrip()]
+	for row in rows:
+		lines.append("  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+
+	return "\n".join(lines)
+
+# what headless mode prints, as (json data, table text)
+def headless_snapshot(store, show):
+
+	if show == "networks":
+		networkData = store.networks(maxAge=0)
+		interfaceStates = get_interface_states([network['portDeviceName'] for network in networkData])
+		networks = [dict(network.as_dict(), interfaceState=interfaceStates[network.portDeviceName])
+			for network in networkData]
+
+		return networks, format_table(
+			("Network ID", "Name", "Status", "Device", "State"),
+			[(network['id'], network_name(network['name']), network['status'],
+				network['portDeviceName'], network['interfaceState']) for network in networks]
+		)
+
+	if show == "peers":
+		peersData = store.peers(maxAge=0)
+
+		return peersData, format_table(
+			("ZT Address", "Version", "Role", "Latency", "Paths"),
+			[(peer['address'], peer_version(peer['version']), peer['role'], peer['latency'],
+				len(peer['paths'])) for peer in peersData]
+		)
+
+	if show == "paths":
+		paths = [dict(path.as_dict(), peer=peer.address)
+			for peer in store.peers(maxAge=0) for path in peer.paths]
+
+		return paths, format_table(
+			("Peer", "Address", "Active", "Expired", "Last Receive", "Last Send", "Preferred", "Trusted Path ID"),
+			[(path['peer'], path['address'], path['active'], path['expired'], path['lastReceive'],
+				path['lastSend'], path['preferred'], path['trustedPathId']) for path in paths]
+		)
+
+	status = store.status(maxAge=0)
+
+	return status, format_table(
+		("ZT Address", "Version", "Status"),
+		[(status['address'], status['version'], "ONLINE" if status['online'] else "OFFLINE")]
+	)
+
+# networks and members of the controller built into the local service,
+# through its /controller endpoints. the member list endpoint only maps
+# member ids to revisions, so members are kept between fetches and only
+# those whose revision moved are fetched again, several at a time, each
+# worker on its own keep-alive connection
+class Controller:
+
+	def __init__(self, api, workers=8):
+		self.api = api
+		self.executor = ThreadPoolExecutor(max_workers=workers)
+		self.connections = local()
+		# network id -> member id -> Member
+		self.members = {}
+		# how many members the last refresh had to fetch
+		self.fetched = 0
+
+	def connection(self):
+		api = getattr(self.connections, 'api', None)
+		if api is None or api.token != self.api.token:
+			api = self.connections.api = ZeroTierAPI(self.api.host, self.api.port,
+				self.api.token, self.api.timeout, cli=False)
+		return api
+
+	def request(self, method, path, body=None):
+		return self.connection().request(method, path, body)
+
+	# runs function over every item on the pool, item -> result
+	# with errors returned as their exception
+	def map(self, function, items):
+
+		def attempt(item):
+			try:
+				return function(item)
+			except (ZeroTierError, OSError, ValueError) as error:
+				return error
+
+		return dict(zip(items, self.executor.map(attempt, items)))
+
+	# every network of the controller with its member count
+	@instrumented("controller networks")
+	def networks(self):
+
+		def network(networkId):
+			data = self.request("GET", f"/controller/network/{networkId}")
+			data['memberCount'] = len(self.request("GET", f"/controller/network/{networkId}/member"))
+			return data
+
+		networks = []
+		for networkId, result in self.map(network, self.request("GET", "/controller/network")).items():
+			if isinstance(result, Exception):
+				raise result
+			networks.append(result)
+		return networks
+
+	# the members of a network, fetching only new and changed ones
+	@instrumented("controller members")
+	def refresh_members(self, networkId):
+
+		revisions = self.request("GET", f"/controller/network/{networkId}/member")
+		known = self.members.get(networkId, {})
+
+		changed = [memberId for memberId, revision in revisions.items()
+			if memberId not in known or known[memberId].revision != revision]
+		fetched = self.map(lambda memberId:
+			self.request("GET", f"/controller/network/{networkId}/member/{memberId}"), changed)
+
+		members = {}
+		for memberId in revisions:
+			data = fetched.get(memberId)
+			if isinstance(data, Exception):
+				raise data
+			member = known.get(memberId)
+			if data is None:
+				pass
+			elif member is None:
+				member = Member(data)
+			else:
+				member.update(data)
+			members[memberId] = member
+
+		self.members[networkId] = members
+		self.fetched = len(changed)
+
+		return sorted(members.values(), key=lambda member: member.id)
+
+	# the service answers with the updated member, which replaces the
+	# known one so the next refresh doesn't fetch it again
+	def set_member(self, networkId, memberId, config):
+		data = self.request("POST", f"/controller/network/{networkId}/member/{memberId}", config)
+		member = self.members.get(networkId, {}).get(memberId)
+		if member is not None and data:
+			member.update(data)
+		return data
+
+	# member id -> answer or error, sent side by side
+	@instrumented("controller authorize")
+	def authorize(self, networkId, memberIds, authorized=True):
+		return self.map(lambda memberId:
+			self.set_member(networkId, memberId, {'authorized': bool(authorized)}), memberIds)
+
+	def set_ip_assignments(self, networkId, memberId, addresses):
+		for address in addresses:
+			try:
+				ip_address(address)
+			except ValueError:
+				raise ZeroTierError(f"{address} isn't an IP address")
+		return self.set_member(networkId, memberId, {'ipAssignments': list(addresses)})
+
+# the last snapshot is kept between runs so the next start
+# can paint it before anything has been fetched
+def snapshot_cache_path():
+	cacheHome = environ.get("XDG_CACHE_HOME") or expanduser("~/.cache")
+	return join(cacheHome, "zerotier-gui", "snapshot.json")
+
+# kind -> data plus 'savedAt', None if there is no usable cache
+def load_snapshot_cache(path=None):
+	try:
+		with open(path or snapshot_cache_path()) as cacheFile:
+			cache = loads(cacheFile.read())
+	except (OSError, ValueError):
+		return None
+	if not isinstance(cache, dict) or not isinstance(cache.get('networks'), list):
+		return None
+	return cache
+
+# written to a temporary file first and renamed over the old one,
+# so a crash never leaves a half written cache behind
+def save_snapshot_cache(snapshot, path=None):
+
+	path = path or snapshot_cache_path()
+	makedirs(dirname(path), exist_ok=True)
+
+	descriptor, temporaryPath = mkstemp(dir=dirname(path), prefix=".snapshot-")
+	try:
+		with fdopen(descriptor, "w") as cacheFile:
+			cacheFile.write(dumps(dict(snapshot, savedAt=strftime("%Y-%m-%d %H:%M:%S")),
+				separators=(",", ":"), default=record_data))
+		replace(temporaryPath, path)
+	except OSError:
+		unlink(temporaryPath)
+		raise
+
+# lines of a plain text file split into fields
+class TextLines(list):
+	pass
+
+# json or yaml data, or a TextLines of the non empty lines of a plain
+# text file, with # starting a comment
+def read_data_file(path):
+
+	with open(path) as dataFile:
+		text = dataFile.read()
+
+	extension = splitext(path)[1].lower()
+	if extension in (".yaml", ".yml"):
+		try:
+			import yaml
+		except ImportError:
+			raise ZeroTierError("Reading YAML files needs PyYAML to be installed")
+		try:
+			return yaml.safe_load(text)
+		except yaml.YAMLError as error:
+			raise ZeroTierError(f"{path}: {error}")
+
+	if extension == ".json" or text.lstrip()[:1] in ("[", "{"):
+		try:
+			return loads(text)
+		except ValueError as error:
+			raise ZeroTierError(f"{path}: {error}")
+
+	lines = TextLines()
+	for line in text.splitlines():
+		fields = line.split("#", 1)[0].split()
+		if fields:
+			lines.append(fields)
+	return lines
+
+# settings a manifest can give for each network
+NETWORK_SETTINGS = ("allowDefault", "allowGlobal", "allowManaged")
+
+def setting_value(value):
+	if isinstance(value, str):
+		if value.lower() in ("1", "true", "yes", "on"):
+			return True
+		if value.lower() in ("0", "false", "no", "off"):
+			return False
+		raise ValueError(value)
+	if isinstance(value, (bool, int)):
+		return bool(value)
+	raise ValueError(value)
+
+# reads the networks to join from a json, yaml or plain text file, as
+# a list of (network id, settings). json and yaml hold either a list of
+# ids or {"id": ..., "allowDefault": ...} objects, or a mapping of id
+# to settings. plain text has one id per line, optionally followed by
+# setting=value pairs, with # starting a comment.
+# every problem in the file is reported at once
+def read_manifest(path):
+
+	data = read_data_file(path)
+	if data.__class__ is TextLines:
+		entries = []
+		for fields in data:
+			entry = {'id': fields[0]}
+			for field in fields[1:]:
+				config, _, value = field.partition("=")
+				entry[config] = value
+			entries.append(entry)
+		data = entries
+
+	# (id, settings) of every entry, settings being checked below
+	if isinstance(data, dict):
+		data = list(data.items())
+	elif isinstance(data, list):
+		data = [(entry.get('id', ""), {config: value for config, value in entry.items() if config != 'id'})
+			if isinstance(entry, dict) else (entry, None) for entry in data]
+	else:
+		raise ZeroTierError(f"{path}: expected a list of networks")
+
+	entries = []
+	errors = []
+	seen = set()
+	for position, (networkId, settings) in enumerate(data, 1):
+
+		networkId = str(networkId).strip().lower()
+		valid = True
+
+		if len(networkId) != 16 or any(character not in "0123456789abcdef" for character in networkId):
+			errors.append(f"entry {position}: \"{networkId}\" is not a 16 digit hexadecimal network ID")
+			valid = False
+		elif networkId in seen:
+			errors.append(f"entry {position}: {networkId} is listed more than once")
+			valid = False
+		seen.add(networkId)
+
+		if settings is None:
+			settings = {}
+		elif not isinstance(settings, dict):
+			errors.append(f"entry {position}: settings must be a mapping")
+			continue
+		else:
+			settings = dict(settings)
+
+		for config in list(settings):
+			if config not in NETWORK_SETTINGS:
+				errors.append(f"entry {position}: unknown setting \"{config}\"")
+				del settings[config]
+				continue
+			try:
+				settings[config] = setting_value(settings[config])
+			except ValueError:
+				errors.append(f"entry {position}: {config} should be true or false")
+				del settings[config]
+
+		if valid:
+			entries.append((networkId, settings))
+
+	if errors:
+		raise ZeroTierError("\n".join(errors))
+	if not entries:
+		raise ZeroTierError(f"{path}: no networks listed")
+
+	return entries
+
+# joins a network and applies its manifest settings
+def join_network_entry(store, networkId, settings):
+	store.join(networkId)
+	for config, value in settings.items():
+		store.set_config(networkId, config, value, confirm=False)
+
+# network id -> status, for the given networks
+def network_statuses(networkData, networkIds):
+	statuses = {network['id']: network['status'] for network in networkData}
+	return {networkId: statuses.get(networkId, "NOT JOINED") for networkId in networkIds}
+
+# polls with one request for all networks until every one of them is
+# OK or the timeout passes, backing off while nothing changes
+def wait_for_networks(store, networkIds, timeout, progress=None):
+
+	deadline = monotonic() + timeout
+	interval = 0.25
+	lastStatuses = None
+
+	while True:
+		statuses = network_statuses(store.networks(maxAge=0), networkIds)
+		if progress is not None and statuses != lastStatuses:
+			progress(statuses)
+
+		remaining = deadline - monotonic()
+		if all(status == "OK" for status in statuses.values()) or remaining <= 0:
+			return statuses
+
+		interval = 0.25 if statuses != lastStatuses else min(interval * 2, 2)
+		lastStatuses = statuses
+		sleep(min(interval, remaining))
+
+# joins every network of a manifest without a gui, printing progress
+# to stderr and the resulting statuses once all are OK or time is up
+def run_join_manifest(arguments):
+
+	try:
+		entries = read_manifest(arguments.join_file)
+		store = SnapshotStore(ZeroTierAPI())
+	except (ZeroTierError, OSError) as error:
+		print(f"Error: {error}", file=stderr)
+		return 1
+
+	results = {}
+	with ThreadPoolExecutor(max_workers=8) as executor:
+		futures = {executor.submit(join_network_entry, store, networkId, settings): networkId
+			for networkId, settings in entries}
+		for done, future in enumerate(as_completed(futures), 1):
+			networkId = futures[future]
+			try:
+				future.result()
+			except (ZeroTierError, OSError, CalledProcessError) as error:
+				results[networkId] = f"Error: {error}"
+				print(f"[{done}/{len(entries)}] {networkId} failed: {error}", file=stderr)
+			else:
+				print(f"[{done}/{len(entries)}] joined {networkId}", file=stderr)
+
+	def report(statuses):
+		ready = sum(status == "OK" for status in statuses.values())
+		print(f"{ready}/{len(statuses)} networks OK", file=stderr)
+
+	joined = [networkId for networkId, settings in entries if networkId not in results]
+	try:
+		if joined:
+			results.update(wait_for_networks(store, joined, arguments.join_timeout, report))
+	except (ZeroTierError, OSError, CalledProcessError) as error:
+		print(f"Error: {error}", file=stderr)
+		return 1
+	except KeyboardInterrupt:
+		return 1
+
+	results = {networkId: results[networkId] for networkId, settings in entries}
+	if arguments.json:
+		print(dumps(results, indent=4))
+	else:
+		print(format_table(("Network ID", "Status"), results.items()))
+
+	return 0 if all(status == "OK" for status in results.values()) else 1
+
+# forwards a free local port to the api port of a remote node
+# through ssh, for nodes that only listen on localhost
+class SSHTunnel:
+
+	def __init__(self, destination, sshPort=None, remotePort=9993):
+		self.destination = destination
+		self.sshPort = sshPort
+		self.remotePort = remotePort
+		self.localPort = None
+		self.process = None
+
+	# returns once the forward takes connections, ssh only opens the
+	# local port after logging in
+	def start(self, timeout=5):
+
+		if self.process is not None and self.process.poll() is None:
+			return
+
+		deadline = monotonic() + timeout
+		while True:
+
+			# the port is free now, but something else may take it
+			# before ssh does, which makes ssh exit and is retried
+			with socket(AF_INET) as probe:
+				probe.bind(("127.0.0.1", 0))
+				self.localPort = probe.getsockname()[1]
+
+			command = ['ssh', '-N', '-o', 'ExitOnForwardFailure=yes', '-o', 'BatchMode=yes',
+				'-o', f"ConnectTimeout={max(1, int(timeout))}",
+				'-L', f"127.0.0.1:{self.localPort}:127.0.0.1:{self.remotePort}"]
+			if self.sshPort:
+				command += ['-p', str(self.sshPort)]
+
+			metrics.count_subprocess('ssh')
+			self.process = Popen(command + [self.destination], stdin=PIPE, stdout=PIPE, stderr=PIPE)
+
+			error = self.wait_for_forward(deadline)
+			if error is None:
+				return
+			self.stop()
+			if "Address already in use" not in error or monotonic() >= deadline:
+				raise ZeroTierError(f"ssh to {self.destination} failed: {error}")
+
+	# None once the local port accepts a connection, or why it never will
+	def wait_for_forward(self, deadline):
+
+		while monotonic() < deadline:
+
+			if self.process.poll() is not None:
+				return self.process.stderr.read().decode(errors="replace").strip() or \
+					f"exited with status {self.process.returncode}"
+
+			try:
+				create_connection(("127.0.0.1", self.localPort), timeout=0.5).close()
+			except OSError:
+				sleep(0.05)
+				continue
+
+			# a forward that failed may have let someone else's listener
+			# answer, ssh exits right after such a failure
+			if self.process.poll() is None:
+				return None
+
+		return "timed out waiting for the tunnel"
+
+	def stop(self):
+		if self.process is not None:
+			self.process.terminate()
+			self.process = None
+
+# a zerotier node polled by the dashboard, reached at an http url or
+# through ssh at ssh://[user@]host[:port]. each keeps its own store,
+# so its records live on between polls
+class Node:
+
+	def __init__(self, name, url, token, timeout=5):
+
+		self.name = name
+		self.url = url
+		self.timeout = timeout
+		self.tunnel = None
+
+		scheme, _, rest = url.partition("://")
+		host, _, port = rest.rstrip("/").rpartition(":")
+		if not host:
+			host, port = port, None
+		if scheme == "ssh":
+			self.tunnel = SSHTunnel(host, port)
+			host, port = "127.0.0.1", None
+		elif scheme != "http":
+			raise ZeroTierError(f"{name}: {url} isn't an http:// or ssh:// url")
+
+		self.api = ZeroTierAPI(host, int(port) if port else 9993, token, timeout, cli=False)
+		self.store = SnapshotStore(self.api, ttl=0)
+
+	# what the dashboard shows of this node, errors included
+	def poll(self):
+
+		start = monotonic()
+		result = {'name': self.name, 'url': self.url}
+		try:
+			if self.tunnel is not None:
+				self.tunnel.start(self.timeout)
+				self.api.port = self.tunnel.localPort
+			result['status'] = self.store.status(maxAge=0)
+			result['networks'] = self.store.networks(maxAge=0)
+			result['peers'] = self.store.peers(maxAge=0)
+		except (ZeroTierError, OSError, ValueError) as error:
+			self.api.close()
+			result['error'] = str(error) or type(error).__name__
+		result['elapsed'] = round((monotonic() - start) * 1000)
+
+		return result
+
+	def stop(self):
+		self.api.close()
+		if self.tunnel is not None:
+			self.tunnel.stop()
+
+# nodes from a json or yaml list of {"name", "url", "token"} (or
+# "tokenFile") objects, or a text file of "name url token" lines
+def read_nodes(path, timeout=5):
+
+	data = read_data_file(path)
+	if data.__class__ is TextLines:
+		data = [dict(zip(("name", "url", "token"), fields)) for fields in data]
+	if not isinstance(data, list):
+		raise ZeroTierError(f"{path}: expected a list of nodes")
+
+	nodes = []
+	errors = []
+	for position, entry in enumerate(data, 1):
+
+		if not isinstance(entry, dict) or not entry.get('url'):
+			errors.append(f"entry {position}: a node needs at least a url")
+			continue
+
+		token = entry.get('token')
+		if not token and entry.get('tokenFile'):
+			try:
+				with open(expanduser(entry['tokenFile'])) as tokenFile:
+					token = tokenFile.read().strip()
+			except OSError as error:
+				errors.append(f"entry {position}: {error}")
+				continue
+		if not token:
+			errors.append(f"entry {position}: a node needs a token or tokenFile")
+			continue
+
+		try:
+			nodes.append(Node(str(entry.get('name') or entry['url']), entry['url'], token, timeout))
+		except (ZeroTierError, ValueError) as error:
+			errors.append(f"entry {position}: {error}")
+
+	if errors:
+		raise ZeroTierError("\n".join(errors))
+	if not nodes:
+		raise ZeroTierError(f"{path}: no nodes listed")
+
+	return nodes
+
+# polls every node at once, limit at a time, each given its own timeout.
+# a node that fails or doesn't answer in time is returned with an error
+# instead of holding up the rest
+async def poll_nodes(nodes, executor, limit=16):
+
+	loop = asyncio.get_running_loop()
+	semaphore = asyncio.Semaphore(limit)
+
+	async def poll(node):
+		async with semaphore:
+			try:
+				return await asyncio.wait_for(loop.run_in_executor(executor, node.poll), node.timeout)
+			except asyncio.TimeoutError:
+				return {'name': node.name, 'url': node.url, 'elapsed': round(node.timeout * 1000),
+					'error': f"No answer after {node.timeout} seconds"}
+
+	return await asyncio.gather(*(poll(node) for node in nodes))
+
+# (key, record) rows of the dashboard's nodes, networks and peers
+def dashboard_rows(results):
+
+	nodeRows = []
+	networkRows = []
+	peerRows = []
+
+	for result in results:
+
+		name = result['name']
+		status = result.get('status')
+
+		if 'error' in result:
+			health = f"ERROR: {result['error']}"
+		elif status.get('online'):
+			health = "ONLINE"
+		else:
+			health = "OFFLINE"
+
+		nodeRows.append((name, (
+			name,
+			result['url'],
+			health,
+			status.get('address', "-") if status else "-",
+			status.get('version', "-") if status else "-",
+			len(result.get('networks', ())),
+			len(result.get('peers', ())),
+			result['elapsed']
+		)))
+
+		for network in result.get('networks', ()):
+			networkRows.append(((name, network['id']), (
+				name,
+				network['id'],
+				network_name(network['name']),
+				network['status'],
+				network['type'],
+				network['portDeviceName']
+			)))
+
+		for peer in result.get('peers', ()):
+			peerRows.append(((name, peer['address']), (
+				name,
+				peer['address'],
+				peer_version(peer['version']),
+				peer['role'],
+				peer['latency'],
+				len(peer['paths'])
+			)))
+
+	return nodeRows, networkRows, peerRows
+
+DASHBOARD_COLUMNS = {
+	'nodes': ("Node", "URL", "Health", "ZT Address", "Version", "Networks", "Peers", "Poll ms"),
+	'networks': ("Node", "Network ID", "Name", "Status", "Type", "Device"),
+	'peers': ("Node", "ZT Address", "Version", "Role", "Latency", "Paths")
+}
+
+# what headless mode prints for --nodes, as (json data, table text)
+def dashboard_snapshot(nodes, show, executor):
+
+	results = asyncio.run(poll_nodes(nodes, executor))
+	nodeRows, networkRows, peerRows = dashboard_rows(results)
+	rows = {'nodes': nodeRows, 'networks': networkRows, 'peers': peerRows}[show]
+
+	return results, format_table(DASHBOARD_COLUMNS[show], [record for key, record in rows])
+
+# prints networks, peers, paths or status without a gui, once
+# or every time they change while watching
+def run_headless(arguments):
+
+	# many nodes at once, or the local one
+	if arguments.nodes:
+		try:
+			nodes = read_nodes(arguments.nodes, arguments.node_timeout)
+		except (ZeroTierError, OSError) as error:
+			print(f"Error: {error}", file=stderr)
+			return 1
+		executor = ThreadPoolExecutor(max_workers=16)
+		snapshot = lambda: dashboard_snapshot(nodes, arguments.show, executor)
+	else:
+		nodes = []
+		store = SnapshotStore(ZeroTierAPI())
+		snapshot = lambda: headless_snapshot(store, arguments.show)
+
+	lastOutput = None
+
+	try:
+		while True:
+
+			try:
+				data, table = snapshot()
+			except (ZeroTierError, OSError, CalledProcessError) as error:
+				print(f"Error: {error}", file=stderr)
+				if not arguments.watch:
+					return 1
+			else:
+				if arguments.json:
+					output = dumps(data, separators=(",", ":") if arguments.watch else None,
+						indent=None if arguments.watch else 4, default=record_data)
+				elif arguments.watch:
+					output = f"{strftime('%Y-%m-%d %H:%M:%S')}\n{table}\n"
+				else:
+					output = table
+
+				# while watching only changes are printed
+				if output != lastOutput or not arguments.watch:
+					print(output, flush=True)
+				lastOutput = output
+
+			if not arguments.watch:
+				return 0
+			sleep(arguments.watch)
+
+	except KeyboardInterrupt:
+		return 0
+
+	finally:
+		for node in nodes:
+			node.stop()
+
+class BackendJob:
+
+	def __init__(self, future):
+		self.future = future
+		self.cancelled = False
+
+	def cancel(self):
+		self.cancelled = True
+		self.future.cancel()
+
+# runs backend calls on its own thread with an asyncio loop, so a slow
+# or hung zerotier-one never blocks tkinter. results are handed back
+# to the gui thread through window.after()
+class BackendEngine:
+
+	def __init__(self, window, workers=8, timeout=10):
+
+		self.window = window
+		self.timeout = timeout
+		self.executor = ThreadPoolExecutor(max_workers=workers)
+		self.results = Queue()
+		self.pending = 0
+		self.pumping = False
+
+		self.loop = asyncio.new_event_loop()
+		started = Event()
+		self.thread = Thread(target=self.run, args=(workers, started), daemon=True)
+		self.thread.start()
+		started.wait()
+
+	def run(self, workers, started):
+		asyncio.set_event_loop(self.loop)
+		# limits how many calls hit the backend at the same time
+		self.limit = asyncio.Semaphore(workers)
+		started.set()
+		self.loop.run_forever()
+
+	def stop(self):
+		self.loop.call_soon_threadsafe(self.loop.stop)
+		self.executor.shutdown(wait=False)
+
+	# jobs are either coroutines or plain functions, the latter
+	# are run on the thread pool
+	async def call(self, job, timeout):
+		async with self.limit:
+			if not asyncio.iscoroutine(job):
+				job = self.loop.run_in_executor(self.executor, job)
+			try:
+				return await asyncio.wait_for(job, timeout)
+			except asyncio.TimeoutError:
+				raise ZeroTierError(f"No answer after {timeout} seconds")
+
+	async def gather(self, jobs, timeout):
+		names = list(jobs)
+		results = await asyncio.gather(
+			*(self.call(jobs[name], timeout) for name in names),
+			return_exceptions=True
+		)
+		# failed calls are returned as their exception
+		return dict(zip(names, results))
+
+	# input is written to the command's stdin
+	async def command(self, args, input=None):
+		metrics.count_subprocess(args[0])
+		process = await asyncio.create_subprocess_exec(*args, stdout=PIPE, stderr=STDOUT,
+			stdin=PIPE if input is not None else None)
+		try:
+			output, _ = await process.communicate(input.encode() if input is not None else None)
+		except asyncio.CancelledError:
+			process.kill()
+			raise
+		if process.returncode:
+			raise ZeroTierError(output.decode().strip())
+		return output.decode()
+
+	# runs every job in parallel and calls callback on the gui
+	# thread with a dict of name -> result once all are done
+	def submit(self, jobs, callback, timeout=None):
+
+		if timeout is None:
+			timeout = self.timeout
+
+		future = asyncio.run_coroutine_threadsafe(self.gather(jobs, timeout), self.loop)
+		job = BackendJob(future)
+		self.pending += 1
+
+		future.add_done_callback(lambda future: self.results.put((job, callback)))
+		self.schedule_pump()
+
+		return job
+
+	def schedule_pump(self):
+		if not self.pumping:
+			self.pumping = True
+			self.window.after(10, self.pump)
+
+	def pump(self):
+
+		finished = []
+		while True:
+			try:
+				finished.append(self.results.get_nowait())
+			except Empty:
+				break
+
+		self.pending -= len(finished)
+		self.pumping = False
+		if self.pending:
+			self.schedule_pump()
+
+		# a failing callback is reported like any tkinter callback
+		# error, without losing the ones after it
+		for job, callback in finished:
+			if job.cancelled or job.future.cancelled():
+				continue
+			try:
+				callback(job.future.result())
+			except Exception:
+				self.window.report_callback_exception(*exc_info())
+
+# polls on its own while enabled, backing off while the data stays the
+# same and tightening again as soon as it changes or looks transient.
+# render is only called when the fetched snapshot actually differs
+class AutoRefresher:
+
+	# with a scheduler, ticks ask it for kind instead of fetching jobs
+	# themselves, and whether what it fetched changed only drives the
+	# backoff since its own callback renders it
+	def __init__(self, engine, widget, jobs, render, busy=None,
+		minInterval=1000, maxInterval=30000, scheduler=None, kind=None):
+
+		self.engine = engine
+		self.widget = widget
+		self.jobs = jobs
+		self.render = render
+		self.busy = busy
+		self.minInterval = minInterval
+		self.maxInterval = maxInterval
+		self.interval = minInterval
+		self.scheduler = scheduler
+		self.kind = kind
+		self.digest = None
+		self.afterId = None
+		self.job = None
+		# the scheduler request whose answer is still awaited
+		self.ticket = None
+
+	def start(self):
+		self.stop()
+		self.interval = self.minInterval
+		self.tick()
+
+	def stop(self):
+		if self.afterId is not None:
+			self.widget.after_cancel(self.afterId)
+			self.afterId = None
+		if self.job is not None:
+			self.job.cancel()
+			self.job = None
+		self.ticket = None
+
+	def tick(self):
+
+		self.afterId = None
+		if not self.widget.winfo_exists():
+			return
+
+		if self.scheduler is None:
+			jobs = {name: self.digested(job) for name, job in self.jobs().items()}
+			self.job = self.engine.submit(jobs, self.check_digested)
+		else:
+			ticket = self.ticket = object()
+			self.scheduler.request(self.kind, quiet=True,
+				callback=lambda results: self.check(results, self.scheduler.changed(self.kind))
+					if ticket is self.ticket else None)
+
+	# the digest of a job's result is taken where it ran, not on the
+	# gui thread. jobs are coroutines or plain functions like for the engine
+	@staticmethod
+	def digested(job):
+
+		if asyncio.iscoroutine(job):
+			async def run():
+				result = await job
+				return result, data_digest(result)
+			return run()
+
+		def run():
+			result = job()
+			return result, data_digest(result)
+		return run
+
+	def check_digested(self, results):
+
+		if any(isinstance(result, Exception) for result in results.values()):
+			self.check(results, False)
+			return
+
+		digest = hash(tuple(digest for name, (result, digest) in sorted(results.items())))
+		changed = digest != self.digest
+		self.digest = digest
+
+		self.check({name: result for name, (result, digest) in results.items()}, changed)
+
+	def check(self, results, changed):
+
+		self.job = None
+		self.ticket = None
+		if not self.widget.winfo_exists():
+			return
+
+		# errors are retried quietly, just less often
+		if any(isinstance(result, Exception) for result in results.values()):
+			self.interval = min(self.interval * 2, self.maxInterval)
+
+		elif changed:
+			if self.render is not None:
+				self.render(results)
+			self.interval = self.minInterval
+		elif self.busy is not None and self.busy(results):
+			self.interval = self.minInterval
+		else:
+			self.interval = min(self.interval * 3 // 2, self.maxInterval)
+
+		self.afterId = self.widget.after(self.interval, self.tick)
+
+# one place to ask for a refresh of some kind of data. requests arriving
+# within delay ms of each other become one fetch, fetches of a kind are
+# at least minInterval ms apart and never overlap: a request made while
+# one is running is served by a single fetch once it's done. requests
+# may pass a callback for the results of the fetch serving them, and
+# quiet ones, like timed refreshes, don't report errors
+class RefreshScheduler:
+
+	def __init__(self, engine, widget, delay=50, minInterval=500):
+
+		self.engine = engine
+		self.widget = widget
+		self.delay = delay
+		self.minInterval = minInterval
+		# kind -> (jobs, callback, version)
+		self.kinds = {}
+		# kind -> version of its last fetch, and the kinds whose
+		# running fetch brought something new
+		self.versions = {}
+		self.changes = set()
+		self.dirty = set()
+		self.running = set()
+		self.afterIds = {}
+		self.lastStarted = {}
+		# kind -> callbacks of the next fetch, and of the running one
+		self.waiting = {}
+		self.serving = {}
+		# kinds with a request that wants errors reported, for the
+		# next fetch and for the running one
+		self.loud = set()
+		self.reporting = set()
+		# how many requests were asked for and how many fetches it took
+		self.requested = 0
+		self.fetched = 0
+
+	# jobs returns the engine jobs of a fetch, callback gets their
+	# results. version(results) is something cheap that's equal for
+	# fetches of the same data, without one every fetch is new
+	def register(self, kind, jobs, callback, version=None):
+		self.kinds[kind] = (jobs, callback, version)
+
+	def request(self, *kinds, callback=None, quiet=False):
+		for kind in kinds:
+			self.requested += 1
+			self.dirty.add(kind)
+			if callback is not None:
+				self.waiting.setdefault(kind, []).append(callback)
+			if not quiet:
+				self.loud.add(kind)
+			if kind not in self.running:
+				self.schedule(kind)
+
+	# whether errors of the running fetch of kind should be shown
+	def reports(self, kind):
+		return kind in self.reporting
+
+	# whether the running fetch of kind differs from the one before
+	def changed(self, kind):
+		return kind in self.changes
+
+	# dirty, waiting or being fetched
+	def pending(self, kind):
+		return kind in self.dirty or kind in self.running
+
+	def schedule(self, kind):
+		if kind in self.afterIds:
+			return
+		wait = self.delay
+		if kind in self.lastStarted:
+			sinceLast = (monotonic() - self.lastStarted[kind]) * 1000
+			wait = max(wait, int(self.minInterval - sinceLast))
+		self.afterIds[kind] = self.widget.after(wait, self.fetch, kind)
+
+	def fetch(self, kind):
+
+		del self.afterIds[kind]
+		if kind in self.running or kind not in self.dirty:
+			return
+
+		self.dirty.discard(kind)
+		self.running.add(kind)
+		self.lastStarted[kind] = monotonic()
+		self.fetched += 1
+		self.serving[kind] = self.waiting.pop(kind, [])
+		if kind in self.loud:
+			self.loud.discard(kind)
+			self.reporting.add(kind)
+
+		jobs, callback, version = self.kinds[kind]
+		self.engine.submit(jobs(), lambda results: self.done(kind, callback, version, results))
+
+	def done(self, kind, callback, version, results):
+		self.running.discard(kind)
+
+		# failed fetches don't replace the version they're compared to
+		if version is None:
+			self.changes.add(kind)
+		elif not any(isinstance(result, Exception) for result in results.values()):
+			current = version(results)
+			if kind not in self.versions or current != self.versions[kind]:
+				self.changes.add(kind)
+			self.versions[kind] = current
+
+		try:
+			# requesters first, then the registered callback
+			for waiter in self.serving.pop(kind, []):
+				waiter(results)
+			callback(results)
+		finally:
+			self.reporting.discard(kind)
+			self.changes.discard(kind)
+			# asked for again while this one was running
+			if kind in self.dirty:
+				self.schedule(kind)
+
+# keeps a listbox in sync with a list of keyed records, touching only
+# the rows that were added, removed, moved or changed so selection and
+# scroll position survive a refresh
+class ListboxRows:
+
+	def __init__(self, listbox):
+		self.listbox = listbox
+		self.keys = []
+		# key -> (text, colors) currently on screen
+		self.shown = {}
+		# key -> (record, text, colors), formatting is skipped
+		# for records that didn't change
+		self.cache = {}
+
+	def format(self, key, record, formatter):
+		cached = self.cache.get(key)
+		if cached is None or cached[0] != record:
+			text, colors = formatter(record)
+			cached = self.cache[key] = (record, text, colors)
+		return cached[1:]
+
+	# key of the selected row, None if nothing is selected
+	def selected_key(self):
+		selection = self.listbox.curselection()
+		if not selection:
+			return None
+		return self.keys[selection[0]]
+
+	# keys of every selected row, in display order
+	def selected_keys(self):
+		return [self.keys[position] for position in self.listbox.curselection()]
+
+	# rows is a list of (key, record), formatter turns a record
+	# into (text, colors)
+	def update(self, rows, formatter):
+
+		newKeys = {key for key, record in rows}
+
+		# rows that went away
+		for position in range(len(self.keys) - 1, -1, -1):
+			key = self.keys[position]
+			if key not in newKeys:
+				self.listbox.delete(position)
+				del self.shown[key]
+				del self.cache[key]
+		self.keys = [key for key in self.keys if key in newKeys]
+
+		for position, (key, record) in enumerate(rows):
+
+			row = self.format(key, record, formatter)
+
+			if position < len(self.keys) and self.keys[position] == key:
+				if self.shown[key] != row:
+					self.place(position, position, key, row)
+				continue
+
+			if key in self.shown:
+				# moved, take it out of its old place
+				self.place(self.keys.index(key, position), position, key, row)
+			else:
+				self.place(None, position, key, row)
+
+	def place(self, oldPosition, position, key, row):
+
+		selected = False
+		if oldPosition is not None:
+			selected = self.listbox.selection_includes(oldPosition)
+			self.listbox.delete(oldPosition)
+			del self.keys[oldPosition]
+
+		text, colors = row
+		self.listbox.insert(position, text)
+		self.keys.insert(position, key)
+		self.shown[key] = row
+
+		if colors:
+			self.listbox.itemconfig(position, **colors)
+		if selected:
+			self.listbox.selection_set(position)
+
+def version_key(version):
+	try:
+		return tuple(int(part) for part in version.split("."))
+	except ValueError:
+		return ()
+
+# unknown latency (-1) sorts after every measured one
+def latency_key(latency):
+	if latency < 0:
+		return float("inf")
+	return latency
+
+# latency and active path count of a peer over its last samples, kept
+# in fixed size arrays used as ring buffers. a sorted copy of the
+# window is kept up to date on every sample, so min, avg and p95 never
+# need to rescan the history
+class PeerHistory:
+
+	__slots__ = ('latencies', 'activePaths', 'next', 'samples', 'total', 'sortedLatencies')
+
+	def __init__(self, size):
+		# -1 is an unknown latency
+		self.latencies = array('f', [-1]) * size
+		self.activePaths = array('B', [0]) * size
+		self.next = 0
+		self.samples = 0
+		self.total = 0.0
+		self.sortedLatencies = array('f')
+
+	def add(self, latency, activePaths):
+
+		# the oldest sample leaves the window
+		oldest = self.latencies[self.next]
+		if self.samples >= len(self.latencies) and oldest >= 0:
+			self.total -= oldest
+			del self.sortedLatencies[bisect_left(self.sortedLatencies, oldest)]
+
+		self.latencies[self.next] = latency
+		self.activePaths[self.next] = min(activePaths, 255)
+
+		# read it back, the array stores it as a float32
+		latency = self.latencies[self.next]
+		if latency >= 0:
+			self.total += latency
+			insort(self.sortedLatencies, latency)
+
+		self.next = (self.next + 1) % len(self.latencies)
+		self.samples += 1
+
+	# one to add to while this one may still be read on another thread
+	def copy(self):
+		history = PeerHistory.__new__(PeerHistory)
+		history.latencies = self.latencies[:]
+		history.activePaths = self.activePaths[:]
+		history.next = self.next
+		history.samples = self.samples
+		history.total = self.total
+		history.sortedLatencies = self.sortedLatencies[:]
+		return history
+
+	# samples from oldest to newest
+	def recent(self, count):
+		size = len(self.latencies)
+		count = min(count, self.samples, size)
+		return [self.latencies[(self.next - count + sample) % size] for sample in range(count)]
+
+	def minimum(self):
+		if self.sortedLatencies:
+			return self.sortedLatencies[0]
+		return None
+
+	def average(self):
+		if self.sortedLatencies:
+			return self.total / len(self.sortedLatencies)
+		return None
+
+	def percentile(self, percent):
+		if self.sortedLatencies:
+			return self.sortedLatencies[(len(self.sortedLatencies) - 1) * percent // 100]
+		return None
+
+	# active paths in the newest sample
+	def current_paths(self):
+		if self.samples:
+			return self.activePaths[self.next - 1]
+		return None
+
+	# fewest active paths over the window, 0 means the peer was
+	# unreachable at some point
+	def fewest_paths(self):
+		if self.samples >= len(self.activePaths):
+			return min(self.activePaths)
+		if self.samples:
+			# not wrapped around yet
+			return min(self.activePaths[:self.samples])
+		return None
+
+# per peer history of the regular peer samples. peers that are gone
+# from a snapshot are dropped with it, so memory stays bounded
+class LatencySampler:
+
+	def __init__(self, size=120, interval=10000):
+		self.size = size
+		self.interval = interval
+		self.histories = {}
+		self.snapshot = None
+		self.running = False
+		# set when the next peers fetch should be recorded, and
+		# how many were
+		self.due = False
+		self.recorded = 0
+
+	# returns False if the snapshot was already recorded. it runs on
+	# a worker while the gui may be reading the histories, so those
+	# are added to as copies and replaced all at once
+	def record(self, peersData):
+
+		if peersData is self.snapshot:
+			return False
+		self.snapshot = peersData
+
+		known = self.histories
+		histories = {}
+		for peer in peersData:
+			history = known.get(peer['address'])
+			history = PeerHistory(self.size) if history is None else history.copy()
+			history.add(peer['latency'], sum(1 for path in peer['paths'] if path['active']))
+			histories[peer['address']] = history
+
+		self.histories = histories
+		self.recorded += 1
+
+		return True
+
+def sparkline(values):
+	levels = "▁▂▃▄▅▆▇█"
+	known = [value for value in values if value >= 0]
+	if not known:
+		return ""
+	low = min(known)
+	spread = (max(known) - low) or 1
+	return "".join(
+		levels[int((value - low) / spread * (len(levels) - 1))] if value >= 0 else " "
+		for value in values
+	)
+
+# sort keys and a prefix index built once per snapshot, so filtering
+# and sorting a table never goes back to the service or scans every row
+class RowIndex:
+
+	def __init__(self, rows, sortKeys, searchTerms):
+
+		# list of (key, record), sort key values of a column are
+		# computed the first time it's sorted by
+		self.rows = rows
+		self.sortKeys = sortKeys
+		self.sortValues = {}
+
+		# (lowercase term, position) of every searchable string
+		self.terms = sorted(
+			(term.lower(), position)
+			for position, (key, record) in enumerate(rows)
+			for term in searchTerms(record) if term
+		)
+
+		# (column, reverse) -> positions in that order, and the
+		# rank of every position in it
+		self.orders = {}
+		self.ranks = {}
+
+	def order(self, column, reverse=False):
+
+		if column is None:
+			return range(len(self.rows))
+
+		if (column, reverse) not in self.orders:
+			if column not in self.sortValues:
+				sortKey = self.sortKeys[column]
+				self.sortValues[column] = [sortKey(record) for key, record in self.rows]
+			values = self.sortValues[column]
+			self.orders[column, reverse] = sorted(range(len(values)),
+				key=values.__getitem__, reverse=reverse)
+
+		return self.orders[column, reverse]
+
+	def rank(self, column, reverse=False):
+
+		if (column, reverse) not in self.ranks:
+			rank = [0] * len(self.rows)
+			for position, row in enumerate(self.order(column, reverse)):
+				rank[row] = position
+			self.ranks[column, reverse] = rank
+
+		return self.ranks[column, reverse]
+
+	# positions of every row with a term starting with text
+	def search(self, text):
+
+		text = text.lower()
+		matches = set()
+
+		position = bisect_left(self.terms, (text,))
+		while position < len(self.terms) and self.terms[position][0].startswith(text):
+			matches.add(self.terms[position][1])
+			position += 1
+
+		return matches
+
+	# positions of the rows to show, in the order to show them
+	def select(self, text="", column=None, reverse=False):
+
+		text = text.strip()
+		if not text:
+			return self.order(column, reverse)
+
+		matches = self.search(text)
+		if column is None:
+			return sorted(matches)
+
+		return sorted(matches, key=self.rank(column, reverse).__getitem__)
+
+# a ttk.Treeview that only holds items for the lines on screen. the
+# full list of rows stays in python and scrolling re-binds the same
+# few items, so the cost of a refresh doesn't depend on its size
+class VirtualTable:
+
+	def __init__(self, master, columns, height=15, background="white"):
+
+		self.frame = tk.Frame(master, bg=background)
+		self.height = height
+
+		self.tree = ttk.Treeview(self.frame, columns=[name for name, width in columns],
+			show="headings", height=height, selectmode="browse")
+		self.columns = [name for name, width in columns]
+		for name, width in columns:
+			self.tree.heading(name, text=name, anchor="w", command=lambda name=name: self.sort_by(name))
+			self.tree.column(name, width=width, stretch=False, anchor="w")
+		self.tree.tag_configure("child", foreground="grey35")
+
+		self.scrollbar = tk.Scrollbar(self.frame, bd=2, command=self.scroll)
+
+		self.scrollbar.pack(side="right", fill="y")
+		self.tree.pack(side="left", fill="both", expand=True)
+
+		# one item per visible line, (values, tags) shown by each
+		# line or None while it's detached
+		self.slots = [self.tree.insert("", "end") for line in range(height)]
+		self.lines = {slot: line for line, slot in enumerate(self.slots)}
+		self.shown = [()] * height
+
+		# list of (key, record) and what they were built from
+		self.rows = []
+		self.data = None
+		self.positions = None
+		# keys of rows showing their children
+		self.expanded = set()
+		# key -> (record, values, tags)
+		self.cache = {}
+		self.formatter = None
+		self.offset = 0
+		self.selected = None
+		self.on_activate = None
+
+		# what the owner filters and sorts the rows by
+		self.index = None
+		self.filterText = ""
+		self.sortColumn = None
+		self.sortReverse = False
+		self.on_sort = None
+
+		self.tree.bind("<<TreeviewSelect>>", self.select_line)
+		self.tree.bind("<Double-Button-1>", self.activate)
+		self.tree.bind("<Return>", self.activate)
+		self.tree.bind("<MouseWheel>", lambda event: self.scroll("scroll", -3 if event.delta > 0 else 3))
+		self.tree.bind("<Button-4>", lambda event: self.scroll("scroll", -3))
+		self.tree.bind("<Button-5>", lambda event: self.scroll("scroll", 3))
+		self.tree.bind("<Up>", lambda event: self.move_selection(-1))
+		self.tree.bind("<Down>", lambda event: self.move_selection(1))
+		self.tree.bind("<Prior>", lambda event: self.move_selection(-self.height))
+		self.tree.bind("<Next>", lambda event: self.move_selection(self.height))
+
+	def pack(self, **options):
+		self.frame.pack(**options)
+
+	def winfo_exists(self):
+		return self.tree.winfo_exists()
+
+	# rows is a list of (key, record), formatter turns a record
+	# into (values, tags)
+	def update(self, rows, formatter):
+
+		self.rows = rows
+		self.formatter = formatter
+		self.positions = None
+
+		# only rows that were on screen are in here, start over
+		# once it has seen a lot of them
+		if len(self.cache) > 50 * self.height:
+			self.cache = {}
+
+		self.offset = max(0, min(self.offset, len(rows) - self.height))
+		self.render()
+
+	def format(self, key, record):
+		cached = self.cache.get(key)
+		if cached is None or cached[0] != record:
+			values, tags = self.formatter(record)
+			cached = self.cache[key] = (record, values, tags)
+		return cached[1:]
+
+	def render(self):
+
+		selectedSlot = None
+
+		for line, slot in enumerate(self.slots):
+
+			position = self.offset + line
+
+			if position >= len(self.rows):
+				if self.shown[line] is not None:
+					self.tree.detach(slot)
+					self.shown[line] = None
+				continue
+
+			key, record = self.rows[position]
+			row = self.format(key, record)
+
+			if self.shown[line] is None:
+				self.tree.move(slot, "", line)
+			if self.shown[line] != row:
+				self.tree.item(slot, values=row[0], tags=row[1])
+			self.shown[line] = row
+
+			if key == self.selected:
+				selectedSlot = slot
+
+		if selectedSlot is not None:
+			self.tree.selection_set(selectedSlot)
+		elif self.tree.selection():
+			self.tree.selection_remove(self.tree.selection())
+
+		if self.rows:
+			self.scrollbar.set(self.offset / len(self.rows),
+				min(1, (self.offset + self.height) / len(self.rows)))
+		else:
+			self.scrollbar.set(0, 1)
+
+	def scroll(self, action, amount, unit="units"):
+
+		if action == "moveto":
+			offset = int(float(amount) * len(self.rows))
+		elif unit == "pages":
+			offset = self.offset + int(amount) * self.height
+		else:
+			offset = self.offset + int(amount)
+
+		self.scroll_to(offset)
+
+		return "break"
+
+	def scroll_to(self, offset):
+		offset = max(0, min(offset, len(self.rows) - self.height))
+		if offset != self.offset:
+			self.offset = offset
+			self.render()
+
+	def position(self, key):
+		if self.positions is None:
+			self.positions = {rowKey: position for position, (rowKey, record) in enumerate(self.rows)}
+		return self.positions.get(key)
+
+	# key of the selected row, None if nothing is selected
+	def selected_key(self):
+		if self.position(self.selected) is None:
+			return None
+		return self.selected
+
+	def select_line(self, event):
+		selection = self.tree.selection()
+		# selection only goes away when the row scrolls out of view
+		if selection:
+			position = self.offset + self.lines[selection[0]]
+			if position < len(self.rows):
+				self.selected = self.rows[position][0]
+
+	def move_selection(self, amount):
+
+		if not self.rows:
+			return "break"
+
+		position = self.position(self.selected)
+		if position is None:
+			position = self.offset
+		else:
+			position = max(0, min(position + amount, len(self.rows) - 1))
+		self.selected = self.rows[position][0]
+
+		# keep it in view
+		if position < self.offset:
+			self.offset = position
+		elif position >= self.offset + self.height:
+			self.offset = position - self.height + 1
+		self.render()
+
+		return "break"
+
+	def activate(self, event):
+		if self.on_activate is not None and self.selected_key() is not None:
+			self.on_activate(self.selected)
+
+	# clicking a heading sorts by it, clicking it again reverses
+	def sort_by(self, column):
+
+		if self.sortColumn == column:
+			self.sortReverse = not self.sortReverse
+		else:
+			self.sortColumn = column
+			self.sortReverse = False
+
+		for name in self.columns:
+			arrow = ""
+			if name == column:
+				arrow = " ▼" if self.sortReverse else " ▲"
+			self.tree.heading(name, text=name + arrow)
+
+		if self.on_sort is not None:
+			self.on_sort()
+
+class MainWindow:
+
+	# window and api can be given to reuse the ones the startup check
+	# used, and networks to paint its answer without fetching it again.
+	# cached is a snapshot from an earlier run, painted as stale, in
+	# which case nothing is fetched until load_networks() is called
+	def __init__(self, cacheTtl=2, window=None, api=None, networks=None, linkWatch=True,
+		cached=None, saveCache=True, privilegedHelper=None):
 
 		# create widgets
 		# window setup
-		self.window = tk.Tk()
+		self.window = window if window is not None else tk.Tk()
 		self.window.title("ZeroTier")
 		self.window.resizable(width = False, height = False)
 
+		# backend
+		self.api = api if api is not None else ZeroTierAPI()
+		self.store = SnapshotStore(self.api, ttl=cacheTtl)
+		self.engine = BackendEngine(self.window)
+		self.scheduler = RefreshScheduler(self.engine, self.window)
+
 		# colors
 		self.background = "#d9d9d9"
 		self.foreground = "black"
@@ -48,32 +2670,52 @@ class MainWindow:
 
 		# layout setup
 		self.topFrame = tk.Frame(self.window, padx = 20, pady = 10, bg=self.background)
+		self.filterFrame = tk.Frame(self.window, padx = 20, bg=self.background)
 		self.topBottomFrame = tk.Frame(self.window, padx = 20, bg=self.background)
 		self.middleFrame = tk.Frame(self.window, padx = 20, bg=self.background)
 		self.bottomFrame = tk.Frame(self.window, padx = 20, pady = 10, bg=self.background)
 
 		# widgets
 		self.networkLabel = tk.Label(self.topFrame, text="Joined Networks:", font=40, bg=self.background, fg=self.foreground)
+		self.staleLabel = tk.Label(self.topFrame, bg=self.background, fg="grey35")
 		self.refreshButton = self.formatted_buttons(self.topFrame,
 			text="Refresh Networks", command=self.refresh_networks)
 		self.aboutButton = self.formatted_buttons(self.topFrame,
 			text="About", command=self.about_window)
+		self.diagnosticsButton = self.formatted_buttons(self.topFrame,
+			text="Diagnostics", command=self.diagnostics_window)
 		self.peersButton = self.formatted_buttons(self.topFrame,
 			text="Show Peers", command=self.see_peers)
 		self.joinButton = self.formatted_buttons(self.topFrame,
 			text="Join Network", command=self.join_network_window)
-
-		self.tableLabels = tk.Label(self.topBottomFrame, font="Monospace",  bg="grey",
-			text="{:19s}{:57s}{:26}".format("Network ID", "Name", "Status"), fg=self.foreground
-		)
+		self.networksRefresher = AutoRefresher(self.engine, self.window, None, None,
+			busy=self.networks_busy, scheduler=self.scheduler, kind='networks')
+		self.autoRefreshCheck = self.auto_refresh_check(self.topFrame, self.networksRefresher)
+
+		self.filterLabel = tk.Label(self.filterFrame, text="Filter:", bg=self.background, fg=self.foreground)
+		self.networkFilter = tk.StringVar()
+		self.networkFilter.trace_add("write", lambda *args: self.filter_networks())
+		self.filterEntry = tk.Entry(self.filterFrame, textvariable=self.networkFilter, font="Monospace")
+
+		# clicking a header sorts by it, clicking it again reverses
+		self.networkHeaders = {}
+		for name, headerFormat in (("Network ID", "{:19s}"), ("Name", "{:57s}"), ("Status", "{:26s}")):
+			header = tk.Label(self.topBottomFrame, font="Monospace", bg="grey",
+				text=headerFormat.format(name), fg=self.foreground
+			)
+			header.format = headerFormat
+			header.bind('<Button-1>', lambda event, name=name: self.sort_networks(name))
+			self.networkHeaders[name] = header
 
 		self.networkListScrollbar = tk.Scrollbar(self.middleFrame, bd=2)
 
 		self.networkList = tk.Listbox(self.middleFrame, width="100", height="15",
-			font="Monospace", selectmode="single", relief="flat", bg="white", fg=self.foreground
+			font="Monospace", selectmode="extended", exportselection=False,
+			relief="flat", bg="white", fg=self.foreground
 		)
 
 		self.networkList.bind('<Double-Button-1>', self.call_see_network_info)
+		self.networkRows = ListboxRows(self.networkList)
 
 		self.leaveButton = self.formatted_buttons(self.bottomFrame, text="Leave Network", bg=self.buttonBackground,
 			activebackground=self.buttonActiveBackground, command=self.leave_network
@@ -87,15 +2729,24 @@ class MainWindow:
 		self.infoButton = self.formatted_buttons(self.bottomFrame, text="Network Info", bg=self.buttonBackground,
 			activebackground=self.buttonActiveBackground, command=self.see_network_info
 		)
+		self.controllerButton = self.formatted_buttons(self.bottomFrame, text="Controller", bg=self.buttonBackground,
+			activebackground=self.buttonActiveBackground, command=self.controller_window
+		)
 
 		# pack widgets
 		self.networkLabel.pack(side="left", anchor="sw")
 		self.refreshButton.pack(side="right", anchor="se")
+		self.autoRefreshCheck.pack(side="right", anchor="se")
 		self.aboutButton.pack(side="right", anchor="sw")
+		self.diagnosticsButton.pack(side="right", anchor="sw")
 		self.peersButton.pack(side="right", anchor="sw")
 		self.joinButton.pack(side="right", anchor="se")
 
-		self.tableLabels.pack(side="left", fill="x")
+		self.filterLabel.pack(side="left")
+		self.filterEntry.pack(side="left", fill="x", expand=True)
+
+		for header in self.networkHeaders.values():
+			header.pack(side="left", fill="x")
 
 		self.networkListScrollbar.pack(side="right", fill="both")
 		self.networkList.pack(side="bottom", fill="x")
@@ -104,130 +2755,511 @@ class MainWindow:
 		self.toggleConnectionButton.pack(side="left", fill="x")
 		self.infoButton.pack(side="right", fill="x")
 		self.ztCentralButton.pack(side="right", fill="x")
+		self.controllerButton.pack(side="right", fill="x")
 
 		# frames
 		self.topFrame.pack(side="top", fill="x")
+		self.filterFrame.pack(side="top", fill="x", pady = (0, 10))
 		self.topBottomFrame.pack(side="top", fill="x")
 		self.middleFrame.pack(side = "top", fill = "x")
 		self.bottomFrame.pack(side = "top", fill = "x")
 
 		# extra configuration
-		self.refresh_networks()
+		self.interfaceStates = {}
+		self.networkData = []
+		self.networkIndex = None
+		self.networkSort = (None, False)
+		self.latencySampler = LatencySampler()
+		self.peerTables = []
+		self.cached = cached or {}
+
+		# every refresh goes through the scheduler
+		self.scheduler.register('networks', self.networks_jobs, self.refreshed_networks,
+			lambda results: (self.store.versions['networks'], results['states']))
+		self.scheduler.register('states', lambda: {'states': self.get_interface_states}, self.refreshed_states,
+			lambda results: results['states'])
+		self.scheduler.register('peers', self.peers_jobs, self.refreshed_peers,
+			lambda results: (self.store.versions['peers'], self.latencySampler.recorded))
+		self.saveCache = saveCache
+		self.saveJob = None
+		# store versions of the last snapshot written
+		self.savedVersions = None
+		# changes links when given, instead of a pkexec each time
+		self.privilegedHelper = privilegedHelper
+		# created the first time the controller window opens
+		self.controller = None
+		# kind -> the one window of that kind, see reuse_sub_window
+		self.subWindows = {}
+
+		# interface state changes recolor rows as they happen
+		self.linkWatcher = None
+		self.linkChanges = Queue()
+		if linkWatch:
+			self.linkWatcher = LinkWatcher(self.link_changed_threadsafe)
+			self.linkWatcher.devices = set()
+			self.linkWatcher.start()
+			self.window.after(250, self.drain_link_changes)
 
 		self.networkList.config(yscrollcommand=self.networkListScrollbar.set)
 		self.networkListScrollbar.config(command=self.networkList.yview)
 
+		if cached is not None:
+			self.show_stale(cached)
+		else:
+			self.load_networks(networks)
+
+	# paints the last run's networks, marked as stale until
+	# fresh ones replace them
+	def show_stale(self, cached):
+		self.staleLabel.config(text=f"(stale, from {cached.get('savedAt', 'an earlier run')})")
+		self.staleLabel.pack(side="left", anchor="sw", padx=(10, 0))
+		self.show_networks(cached['networks'])
+		self.refresh_interface_states()
+
+	# paints the known networks right away and fills in their interface
+	# states once they arrive, or fetches both when networks is None
+	def load_networks(self, networks=None):
+		if networks is not None:
+			self.store.seed('networks', networks)
+			self.staleLabel.pack_forget()
+			self.show_networks(networks)
+			self.refresh_interface_states()
+			self.schedule_save()
+		else:
+			self.refresh_networks()
+
+	# fresh data is written to the on-disk cache a few seconds after
+	# it arrives, once for any number of updates in between
+	def schedule_save(self):
+		if self.saveCache and self.saveJob is None:
+			self.saveJob = self.window.after(5000, self.save_snapshot)
+
+	# the same snapshot as the last one written isn't written again
+	def save_snapshot(self):
+		self.saveJob = None
+		versions = dict(self.store.versions)
+		if versions == self.savedVersions:
+			return
+
+		# kinds not fetched this time keep what the cache had
+		snapshot = {kind: data for kind, data in self.cached.items() if kind != 'savedAt'}
+		snapshot.update(self.store.export())
+		self.cached = snapshot
+
+		def saved(results):
+			if not isinstance(results['save'], Exception):
+				self.savedVersions = versions
+
+		self.engine.submit({'save': lambda: save_snapshot_cache(snapshot)}, saved)
+
 	def zt_central(self):
 		open_new_tab("https://my.zerotier.com")
 
 	def call_see_network_info(self, event):
 		self.see_network_info()
 
-	def refresh_paths(self, pathsList, idInList):
+	# creates the checkbox that turns refresher on and off
+	def auto_refresh_check(self, frame, refresher):
 
-		pathsList.delete(0, 'end')
-		paths = []
-		# outputs info of paths in json format
-		pathsData = self.get_peers_info()[idInList]['paths']
-
-		# get paths information in a list of tuples
-		for pathPosition in range(len(pathsData)):
-			paths.append((
-				pathsData[pathPosition]['active'],
-				pathsData[pathPosition]['address'],
-				pathsData[pathPosition]['expired'],
-				pathsData[pathPosition]['lastReceive'],
-				pathsData[pathPosition]['lastSend'],
-				pathsData[pathPosition]['preferred'],
-				pathsData[pathPosition]['trustedPathId']
-			))
-
-		# set paths in listbox
-		for pathActive, pathAddress, pathExpired, pathLastReceive, pathLastSend, pathPreferred, pathTrustedId in paths:
-			pathsList.insert('end', '{:6s} | {:44s} | {:7s} | {:13s} | {:13s} | {:9s} | {}'.format(
-				str(pathActive),
-				str(pathAddress),
-				str(pathExpired),
-				str(pathLastReceive),
-				str(pathLastSend),
-				str(pathPreferred),
-				str(pathTrustedId)
-			))
-
-	def refresh_peers(self, peersList):
-
-		peersList.delete(0, 'end')
+		enabled = tk.BooleanVar()
+		check = tk.Checkbutton(frame, text="Auto Refresh", variable=enabled,
+			command=lambda: refresher.start() if enabled.get() else refresher.stop(),
+			bg=self.background, fg=self.foreground, activebackground=self.background,
+			highlightthickness=0
+		)
+		# keeps the variable alive as long as the widget
+		check.enabled = enabled
+		check.refresher = refresher
+
+		return check
+
+	def stop_auto_refresh(self, check):
+		check.enabled.set(False)
+		check.refresher.stop()
+
+	def paths_jobs(self, peerAddress, maxAge=0):
+		return {'paths': lambda: self.store.peer(peerAddress, maxAge)['paths']}
+
+	def refresh_paths(self, pathRows, peerAddress, maxAge=0):
+
+		def show_paths(results):
+			# the window may have moved on to another peer
+			if pathRows.peerAddress != peerAddress:
+				return
+			if pathRows.listbox.winfo_exists() and not self.failed(results['paths']):
+				self.show_paths(pathRows, results['paths'])
+
+		self.engine.submit(self.paths_jobs(peerAddress, maxAge), show_paths)
+
+	@instrumented("render paths")
+	def show_paths(self, pathRows, pathsData):
+		pathRows.update(path_records(pathsData), self.format_path)
+
+	def format_path(self, path):
+
+		pathActive, pathAddress, pathExpired, pathLastReceive, pathLastSend, pathPreferred, pathTrustedId = path
+
+		return '{:6s} | {:44s} | {:7s} | {:13s} | {:13s} | {:9s} | {}'.format(
+			str(pathActive),
+			str(pathAddress),
+			str(pathExpired),
+			str(pathLastReceive),
+			str(pathLastSend),
+			str(pathPreferred),
+			str(pathTrustedId)
+		), None
+
+	# a fetch made while a latency sample is due records it on the
+	# worker, the gui only gets the new histories
+	def peers_jobs(self):
+
+		sample = self.latencySampler.due
+		self.latencySampler.due = False
+
+		def peers():
+			peersData = self.get_peers_info(maxAge=0)
+			if sample:
+				self.latencySampler.record(peersData)
+			return peersData
+
+		return {'peers': peers}
+
+	# one fetch refreshes every open peers window
+	def refresh_peers(self):
+		self.scheduler.request('peers')
+
+	# tables already showing the same data are left alone, and
+	# unchanged data isn't saved again
+	def refreshed_peers(self, results):
+		peerTables = self.shown_peer_tables()
+		if not peerTables or self.fetch_failed('peers', results['peers']):
+			return
+		version = self.scheduler.versions['peers']
+		for peerTable in peerTables:
+			if peerTable.version != version:
+				self.show_peers(peerTable, results['peers'], version)
+		if self.scheduler.changed('peers'):
+			self.schedule_save()
+
+	# hidden tables are brought up to date when shown again
+	def shown_peer_tables(self):
+		self.peerTables = [peerTable for peerTable in self.peerTables if peerTable.winfo_exists()]
+		return [peerTable for peerTable in self.peerTables if peerTable.tree.winfo_toplevel().state() != "withdrawn"]
+
+	# version is the scheduler's for fetched peers, None for others
+	@instrumented("render peers")
+	def show_peers(self, peerTable, peersData, version=None):
+
+		peers = []
+
+		# get peers information in a list of tuples, keyed by address.
+		# the sample count makes a row change when its history does
+		for peer in peersData:
+			history = self.latencySampler.histories.get(peer['address'])
+			peers.append((peer['address'], (
+				peer['address'],
+				peer['version'],
+				peer['role'],
+				peer['latency'],
+				bool(peer['paths']),
+				history,
+				history.samples if history else 0
+			)))
+
+		def statistic_key(statistic):
+			def sort_key(peer):
+				if peer[5] is None or statistic(peer[5]) is None:
+					return float("inf")
+				return statistic(peer[5])
+			return sort_key
+
+		peerTable.data = peersData
+		peerTable.version = version
+		peerTable.index = RowIndex(peers, {
+			"ZT Address": lambda peer: peer[0],
+			"Version": lambda peer: version_key(peer[1]),
+			"Role": lambda peer: peer[2],
+			"Latency": lambda peer: latency_key(peer[3]),
+			"History": statistic_key(PeerHistory.average),
+			"Min": statistic_key(PeerHistory.minimum),
+			"Avg": statistic_key(PeerHistory.average),
+			"P95": statistic_key(lambda history: history.percentile(95)),
+			"Paths": statistic_key(PeerHistory.fewest_paths)
+		}, lambda peer: (peer[0],))
+
+		self.filter_peers(peerTable)
+
+	@instrumented("filter peers")
+	def filter_peers(self, peerTable):
+
+		if peerTable.index is None:
+			return
+
+		positions = peerTable.index.select(peerTable.filterText,
+			peerTable.sortColumn, peerTable.sortReverse)
+		rows = peerTable.index.rows
+
+		# path rows are only built for peers that are expanded
 		peers = []
-		# outputs info of peers in json format
-		peersData = self.get_peers_info()
-
-		# get peers information in a list of tuples
-		for peerPosition in range(len(peersData)):
-			peers.append((
-				peersData[peerPosition]['address'],
-				peersData[peerPosition]['version'],
-				peersData[peerPosition]['role'],
-				peersData[peerPosition]['latency']
-			))
-
-		# set peers in listbox
-		for peerAddress, peerVersion, peerRole, peerLatency in peers:
-
-			if peerVersion == "-1.-1.-1":
-				peerVersion = "-"
-			peersList.insert('end', '{} | {:10s} | {:10s} | {:4s}'.format(
-				peerAddress,
-				peerVersion,
-				peerRole,
-				str(peerLatency)
-			))
+		for position in positions:
+
+			peerAddress, peer = rows[position]
+			peers.append(rows[position])
+
+			if peerAddress in peerTable.expanded:
+				for path in peerTable.data[position]['paths']:
+					peers.append(((peerAddress, path['address']), (
+						path['address'],
+						path['active'],
+						path['preferred'],
+						path['lastReceive']
+					)))
+
+		peerTable.update(peers, lambda peer: self.format_peer(peer, peerTable.expanded))
+
+	def format_peer(self, peer, expanded=()):
+
+		# path of an expanded peer
+		if len(peer) == 4:
+			pathAddress, pathActive, pathPreferred, pathLastReceive = peer
+			return (
+				f"    {pathAddress}",
+				"active" if pathActive else "inactive",
+				"preferred" if pathPreferred else "",
+				str(pathLastReceive)
+			), ("child",)
+
+		peerAddress, peerVersion, peerRole, peerLatency, hasPaths, history, samples = peer
+
+		peerVersion = peer_version(peerVersion)
+
+		if not hasPaths:
+			marker = "  "
+		elif peerAddress in expanded:
+			marker = "▾ "
+		else:
+			marker = "▸ "
+
+		# latency over the last samples, and active paths now / at fewest
+		if history is None:
+			statistics = ("", "-", "-", "-", "-")
+		else:
+			statistics = (sparkline(history.recent(30)),) + tuple(
+				"-" if value is None else f"{value:.0f}"
+				for value in (history.minimum(), history.average(), history.percentile(95))
+			) + (f"{history.current_paths()}/{history.fewest_paths()}",)
+
+		return (
+			marker + peerAddress,
+			peerVersion,
+			peerRole,
+			str(peerLatency),
+			*statistics
+		), ()
+
+	# samples every peer's latency in the background. the fetch is
+	# shared with any other peers refresh, records the sample on the
+	# worker and renders the open peers tables with it
+	def sample_latency(self):
+		self.latencySampler.due = True
+		self.scheduler.request('peers', quiet=True,
+			callback=lambda results: self.window.after(self.latencySampler.interval, self.sample_latency))
+
+	# shows or hides the path rows of a peer
+	def toggle_peer_paths(self, peerTable, key):
+
+		# path rows are keyed by (peer address, path address)
+		peerAddress = key if isinstance(key, str) else key[0]
+
+		if peerAddress in peerTable.expanded:
+			peerTable.expanded.remove(peerAddress)
+		else:
+			peerTable.expanded.add(peerAddress)
+
+		# its marker changed
+		peerTable.cache.pop(peerAddress, None)
+
+		peerTable.selected = peerAddress
+		self.filter_peers(peerTable)
+
+	# networks and the state of every device load in parallel
+	def networks_jobs(self):
+		return {
+			'networks': lambda: self.get_networks_info(maxAge=0),
+			'states': self.get_interface_states
+		}
+
+	# the same networks and states as shown are neither rendered nor
+	# saved again. the link watcher may have changed the states shown
+	# since the last fetch, so those are compared to what's on screen
+	def update_networks(self, results):
+		self.staleLabel.pack_forget()
+		if not self.scheduler.changed('networks') and results['states'] == self.interfaceStates:
+			return
+		self.interfaceStates = results['states']
+		self.show_networks(results['networks'])
+		self.schedule_save()
+
+	# networks still settling are polled at the fastest rate
+	def networks_busy(self, results):
+		return any(network['status'] == "REQUESTING_CONFIGURATION"
+			for network in results['networks'])
 
 	def refresh_networks(self):
+		self.scheduler.request('networks')
 
-		self.networkList.delete(0, 'end')
-		networks = []
-		# outputs info of networks in json format
-		networkData = self.get_networks_info()
+	def refreshed_networks(self, results):
+		if self.fetch_failed('networks', results['networks']):
+			return
+		if self.fetch_failed('networks', results['states']):
+			results['states'] = {}
+		self.update_networks(results)
 
-		# gets networks information in a list of tuples
-		for networkPosition in range(len(networkData)):
+	# called by the link watcher thread. tkinter calls from other
+	# threads are lost when tcl isn't built threaded, so changes are
+	# queued for drain_link_changes to pick up on the gui thread
+	def link_changed_threadsafe(self, device, state):
+		self.linkChanges.put((device, state))
 
-			interfaceState = self.get_interface_state(networkData[networkPosition]['portDeviceName'])
+	# a burst of changes is shown with one render
+	def drain_link_changes(self):
 
-			if interfaceState.lower() == "down":
-				isDown = True
-			else:
-				isDown = False
-
-			networks.append((
-				networkData[networkPosition]['id'],
-				networkData[networkPosition]['name'],
-				networkData[networkPosition]['status'],
-				isDown,
-				networkPosition
-			))
-
-		# set networks in listbox
-		for networkId, networkName, networkStatus, isDown, networkPosition in networks:
-
-			if not networkName:
-				networkName = "No name"
-			self.networkList.insert('end', '{} | {:55s} |{}'.format(
-				networkId,
-				networkName,
-				networkStatus
-			))
-
-			if isDown:
-				self.networkList.itemconfig(networkPosition, bg='red', selectbackground='#de0303')
-
-	def get_networks_info(self):
-		# json.loads
-		return loads(check_output(['zerotier-cli', '-j', 'listnetworks']))
-
-	def get_peers_info(self):
-		# json.loads
-		return loads(check_output(['zerotier-cli', '-j', 'peers']))
+		changed = False
+		while True:
+			try:
+				device, state = self.linkChanges.get_nowait()
+			except Empty:
+				break
+			if self.interfaceStates.get(device) != state:
+				self.interfaceStates[device] = state
+				changed = True
+
+		if changed:
+			self.show_networks(self.networkData)
+		self.window.after(250, self.drain_link_changes)
+
+	def refresh_interface_states(self):
+		self.scheduler.request('states')
+
+	def refreshed_states(self, results):
+		if not isinstance(results['states'], Exception) and results['states'] != self.interfaceStates:
+			self.interfaceStates = results['states']
+			self.show_networks(self.networkData)
+
+	@instrumented("render networks")
+	def show_networks(self, networkData):
+
+		self.networkData = networkData
+		if self.linkWatcher is not None:
+			self.linkWatcher.devices = {network['portDeviceName'] for network in networkData}
+
+		networks = network_records(networkData, self.interfaceStates)
+
+		# ids, whole names and every word of them can be searched
+		self.networkIndex = RowIndex(networks, {
+			"Network ID": lambda network: network[0],
+			"Name": lambda network: network[1].lower(),
+			"Status": lambda network: network[2]
+		}, lambda network: (network[0], network[1], *network[1].split()))
+
+		self.filter_networks()
+		self.refresh_network_info(networkData)
+
+	@instrumented("filter networks")
+	def filter_networks(self):
+
+		if self.networkIndex is None:
+			return
+
+		sortColumn, sortReverse = self.networkSort
+		positions = self.networkIndex.select(self.networkFilter.get(), sortColumn, sortReverse)
+
+		rows = self.networkIndex.rows
+		self.networkRows.update([rows[position] for position in positions], self.format_network)
+
+	def sort_networks(self, column):
+
+		sortColumn, sortReverse = self.networkSort
+		if sortColumn == column:
+			self.networkSort = (column, not sortReverse)
+		else:
+			self.networkSort = (column, False)
+
+		for name, header in self.networkHeaders.items():
+			arrow = ""
+			if name == column:
+				arrow = " ▼" if self.networkSort[1] else " ▲"
+			header.config(text=header.format.format(name + arrow))
+
+		self.filter_networks()
+
+	def format_network(self, network):
+
+		networkId, networkName, networkStatus, isDown = network
+
+		networkName = network_name(networkName)
+
+		if isDown:
+			colors = {'bg': 'red', 'selectbackground': '#de0303'}
+		else:
+			colors = None
+
+		return '{} | {:55s} |{}'.format(
+			networkId,
+			networkName,
+			networkStatus
+		), colors
+
+	# selected network ids, None after telling the user
+	# that nothing is selected
+	def selected_networks(self):
+		networkIds = self.networkRows.selected_keys()
+		if not networkIds:
+			messagebox.showinfo(icon="info", title="Error", message="No network selected")
+			return None
+		return networkIds
+
+	# one message for a whole batch, results is a dict of
+	# network id -> result, exceptions being failures
+	def show_batch_result(self, action, results):
+
+		failures = {networkId: result for networkId, result in results.items()
+			if isinstance(result, Exception)}
+
+		if len(results) == 1:
+			message = f"Error: \"{next(iter(failures.values()))}\"" if failures else f"Successfully {action}"
+		else:
+			message = f"Successfully {action}: {len(results) - len(failures)} of {len(results)}"
+			if failures:
+				message += "\n\n" + "\n".join(f"{networkId}: {error}"
+					for networkId, error in failures.items())
+
+		messagebox.showinfo(icon="error" if failures else "info", message=message)
+
+	# like failed, but errors of fetches only timed refreshes asked
+	# for are left for the next one
+	def fetch_failed(self, kind, result):
+		if not isinstance(result, Exception):
+			return False
+		if self.scheduler.reports(kind):
+			self.failed(result)
+		return True
+
+	# shows backend errors, returns True if result is one
+	def failed(self, result):
+		if isinstance(result, Exception):
+			messagebox.showinfo(title="Error", message=f"Error: \"{result}\"", icon="error")
+			return True
+		return False
+
+	# both read the shared snapshot, maxAge=0 forces a new fetch
+	@instrumented("get_networks_info")
+	def get_networks_info(self, maxAge=None):
+		return self.store.networks(maxAge)
+
+	@instrumented("get_peers_info")
+	def get_peers_info(self, maxAge=None):
+		return self.store.peers(maxAge)
 
 	def launch_sub_window(self, title):
 		subWindow = tk.Toplevel(self.window)
@@ -236,6 +3268,38 @@ class MainWindow:
 
 		return subWindow
 
+	# windows of a kind are built once by build(window). closing one
+	# only hides it, opening it again shows the same widgets
+	def reuse_sub_window(self, kind, title, build):
+
+		subWindow = self.subWindows.get(kind)
+		if subWindow is not None and subWindow.winfo_exists():
+			subWindow.deiconify()
+			subWindow.lift()
+			return subWindow
+
+		subWindow = self.subWindows[kind] = self.launch_sub_window(title)
+		subWindow.on_hide = None
+		subWindow.protocol("WM_DELETE_WINDOW", lambda: self.hide_sub_window(subWindow))
+		build(subWindow)
+
+		return subWindow
+
+	def hide_sub_window(self, subWindow):
+		if subWindow.on_hide is not None:
+			subWindow.on_hide()
+		subWindow.withdraw()
+
+	# new text for a label or a selectable text
+	def set_text(self, widget, text):
+		if isinstance(widget, tk.Entry):
+			widget.config(state="normal")
+			widget.delete(0, "end")
+			widget.insert(0, text)
+			widget.config(state="readonly", width=len(text))
+		else:
+			widget.config(text=text)
+
 	# creates entry widgets to select and copy text
 	def selectable_text(self, frame, text, justify="left", font="TkDefaultFont"):
 
@@ -287,16 +3351,21 @@ class MainWindow:
 
 		def join_network(network):
 
-			try:
-				check_output(['zerotier-cli', 'join', network])
-				joinResult = "Successfully joined network"
-			except:
-				joinResult = "Invalid network ID"
+			def show_result(results):
 
-			messagebox.showinfo(icon="info", message=joinResult)
-			self.refresh_networks()
+				if isinstance(results['join'], Exception):
+					joinResult = "Invalid network ID"
+				else:
+					joinResult = "Successfully joined network"
 
-			joinWindow.destroy()
+				messagebox.showinfo(icon="info", message=joinResult)
+				self.refresh_networks()
+
+				if joinWindow.winfo_exists():
+					joinWindow.destroy()
+
+			joinButton.config(state="disabled")
+			self.engine.submit({'join': lambda: self.store.join(network)}, show_result)
 
 		joinWindow = self.launch_sub_window("Join Network")
 
@@ -307,53 +3376,159 @@ class MainWindow:
 		networkIdEntry = tk.Entry(mainFrame, font="Monospace")
 		joinButton = self.formatted_buttons(mainFrame, text="Join", bg=self.buttonBackground,
 			activebackground=self.buttonActiveBackground, command=lambda: join_network(networkIdEntry.get()))
+		fileButton = self.formatted_buttons(mainFrame, text="Join from File", bg=self.buttonBackground,
+			activebackground=self.buttonActiveBackground, command=lambda: self.join_from_file(joinWindow))
 
 		# pack widgets
 		joinLabel.pack(side="top", anchor="w")
 		networkIdEntry.pack(side="top", fill="x")
 		joinButton.pack(side="top", fill="x")
+		fileButton.pack(side="top", fill="x", pady=(10, 0))
 
 		mainFrame.pack(side="top", fill="x")
 
-	def leave_network(self):
+	def join_from_file(self, joinWindow):
 
-		# get selected network
+		path = filedialog.askopenfilename(parent=joinWindow, title="Join Networks from File",
+			filetypes=[("Manifests", "*.json *.yaml *.yml *.txt"), ("All files", "*")])
+		if not path:
+			return
+
+		# nothing is joined unless the whole file is valid
 		try:
-			self.networkList.curselection()[0]
-		except:
-			messagebox.showinfo(icon="info", title="Error", message="No network selected")
+			entries = read_manifest(path)
+		except (ZeroTierError, OSError) as error:
+			self.failed(error)
 			return
 
-		network = self.networkList.get('active')
-		network = network[:network.find(" ")]
+		joinWindow.destroy()
+		self.join_manifest_window(entries)
 
-		answer = messagebox.askyesno(title="Leave Network",
-			message=f"Are you sure you want to leave {network}?")
+	# joins and configures every network side by side, then waits
+	# until all of them are OK, with a bar following both steps
+	def join_manifest_window(self, entries, timeout=60):
 
-		if answer:
-			try:
-				check_output(['zerotier-cli', 'leave', network])
-				leaveResult = "Successfully left network"
-			except:
-				leaveResult = "Error"
+		progressWindow = self.launch_sub_window("Join Networks")
+
+		mainFrame = tk.Frame(progressWindow, padx=20, pady=20, bg=self.background)
+		progressLabel = tk.Label(mainFrame, text=f"Joining {len(entries)} networks",
+			bg=self.background, fg=self.foreground)
+		progressBar = ttk.Progressbar(mainFrame, length=400, maximum=2 * len(entries))
+		closeButton = self.formatted_buttons(mainFrame, text="Close", bg=self.buttonBackground,
+			activebackground=self.buttonActiveBackground, command=lambda: progressWindow.destroy())
+
+		progressLabel.pack(side="top", anchor="w")
+		progressBar.pack(side="top", fill="x", pady=10)
+		closeButton.pack(side="top")
+		mainFrame.pack(side="top", fill="both")
+
+		results = {}
+		deadline = None
+
+		def joined(networkId, jobResults):
+			if isinstance(jobResults[networkId], Exception):
+				results[networkId] = jobResults[networkId]
+			else:
+				results[networkId] = None
+
+			if not progressWindow.winfo_exists():
+				return
+			progressBar.config(value=len(results))
+			progressLabel.config(text=f"Joined {len(results)} of {len(entries)} networks")
+
+			if len(results) == len(entries):
+				nonlocal deadline
+				deadline = monotonic() + timeout
+				self.refresh_networks()
+				poll(250)
+
+		def poll(interval):
+			if progressWindow.winfo_exists():
+				self.engine.submit({'networks': lambda: self.store.networks(maxAge=0)},
+					lambda jobResults: check(jobResults, interval))
+
+		def check(jobResults, interval):
+
+			if not progressWindow.winfo_exists() or self.failed(jobResults['networks']):
+				return
+
+			waiting = [networkId for networkId, result in results.items() if result is None]
+			statuses = network_statuses(jobResults['networks'], waiting)
+			ready = sum(status == "OK" for status in statuses.values())
+
+			progressBar.config(value=len(entries) + len(entries) - len(waiting) + ready)
+			progressLabel.config(text=f"{ready} of {len(waiting)} networks OK")
+
+			if ready < len(waiting) and monotonic() < deadline:
+				# settles quicker while statuses keep moving
+				lastReady = getattr(progressWindow, "lastReady", None)
+				progressWindow.lastReady = ready
+				progressWindow.after(interval, poll, 250 if ready != lastReady else min(interval * 2, 2000))
+				return
+
+			self.refresh_networks()
+			for networkId, status in statuses.items():
+				results[networkId] = status if status == "OK" else ZeroTierError(f"status is {status}")
+			self.show_batch_result("joined networks", results)
+
+		for networkId, settings in entries:
+			self.engine.submit(
+				{networkId: lambda networkId=networkId, settings=settings:
+					join_network_entry(self.store, networkId, settings)},
+				lambda jobResults, networkId=networkId: joined(networkId, jobResults)
+			)
+
+	def leave_network(self):
+
+		# get selected networks
+		networkIds = self.selected_networks()
+		if networkIds is None:
+			return
+
+		if len(networkIds) == 1:
+			question = f"Are you sure you want to leave {networkIds[0]}?"
 		else:
+			question = f"Are you sure you want to leave these {len(networkIds)} networks?"
+
+		if not messagebox.askyesno(title="Leave Network", message=question):
 			return
 
-		messagebox.showinfo(icon="info", message=leaveResult)
-		self.refresh_networks()
+		def show_result(results):
+			self.show_batch_result("left network" if len(results) == 1 else "left networks", results)
+			self.refresh_networks()
+
+		# the engine runs them side by side, a few at a time
+		self.engine.submit({
+			networkId: lambda networkId=networkId: self.store.leave(networkId)
+			for networkId in networkIds
+		}, show_result)
 
+	@instrumented("get_status")
 	def get_status(self):
 
-		status = check_output(['zerotier-cli', 'status']).decode()
-		status = status.split()
+		status = self.store.status()
 
-		# returns a list with status info
+		# returns a dict with status info
 		return status
 
 	def about_window(self):
 
-		statusWindow = self.launch_sub_window("About")
-		status = self.get_status()
+		def show_status(results):
+			if not self.failed(results['status']):
+				self.show_about_window(results['status'])
+
+		self.engine.submit({'status': self.get_status}, show_status)
+
+	def show_about_window(self, status):
+
+		statusWindow = self.reuse_sub_window("about", "About", self.build_about_window)
+
+		self.set_text(statusWindow.ztAddrLabel, "{:25s}{}".format("My ZeroTier Address:", status['address']))
+		statusWindow.versionLabel.config(text="{:25s}{}".format("ZeroTier Version:", status['version']))
+		statusWindow.statusLabel.config(
+			text="{:25s}{}".format("Status:", "ONLINE" if status['online'] else "OFFLINE"))
+
+	def build_about_window(self, statusWindow):
 
 		# frames
 		topFrame = tk.Frame(statusWindow, padx=20, pady=30, bg=self.background)
@@ -366,10 +3541,10 @@ class MainWindow:
 			bg=self.background, fg=self.foreground)
 
 		ztAddrLabel = self.selectable_text(middleFrame, font="Monospace",
-			text="{:25s}{}".format("My ZeroTier Address:", status[2])
+			text="{:25s}{}".format("My ZeroTier Address:", "-")
 		)
 		versionLabel = tk.Label(middleFrame, font="Monospace",
-			text="{:25s}{}".format("ZeroTier Version:", status[3]),
+			text="{:25s}{}".format("ZeroTier Version:", "-"),
 			bg=self.background, fg=self.foreground
 		)
 		ztGuiVersionLabel = tk.Label(middleFrame, font="Monospace",
@@ -377,12 +3552,12 @@ class MainWindow:
 			bg=self.background, fg=self.foreground
 		)
 		statusLabel = tk.Label(middleFrame, font="Monospace",
-			text="{:25s}{}".format("Status:", status[4]),
+			text="{:25s}{}".format("Status:", "-"),
 			bg=self.background, fg=self.foreground
 		)
 
 		closeButton = self.formatted_buttons(bottomTopFrame, text="Close", bg=self.buttonBackground, activebackground=self.buttonActiveBackground,
-			command=lambda: statusWindow.destroy()
+			command=lambda: self.hide_sub_window(statusWindow)
 		)
 
 
@@ -410,53 +3585,175 @@ class MainWindow:
 		bottomTopFrame.pack(side="top", fill="both")
 		bottomFrame.pack(side="top", fill="both")
 
-		statusWindow.mainloop()
+		# filled in every time the window is shown
+		statusWindow.ztAddrLabel = ztAddrLabel
+		statusWindow.versionLabel = versionLabel
+		statusWindow.statusLabel = statusLabel
+
+	def diagnostics_window(self):
 
-	def get_interface_state(self, interface):
+		diagnosticsWindow = self.launch_sub_window("Diagnostics")
+
+		# frames
+		topFrame = tk.Frame(diagnosticsWindow, padx=20, pady=30, bg=self.background)
+		middleFrame = tk.Frame(diagnosticsWindow, padx=20, bg=self.background)
+		bottomFrame = tk.Frame(diagnosticsWindow, padx=20, pady=10, bg=self.background)
 
-		addressesInfo = check_output(['ip', 'address']).decode()
+		# widgets
+		titleLabel = tk.Label(topFrame, text="Diagnostics", font=70,
+			bg=self.background, fg=self.foreground)
 
-		stateLine = addressesInfo.find(interface)
-		stateStart = addressesInfo.find("state ", stateLine)
-		# 6 is the offset for the "state" word
-		stateEnd = addressesInfo.find(" ", stateStart + 6)
-		state = addressesInfo[stateStart + 6:stateEnd]
+		metricsText = tk.Text(middleFrame, width=100, height=25, font="Monospace",
+			relief="flat", bg="white", fg=self.foreground, state="disabled")
 
-		return state
+		closeButton = self.formatted_buttons(bottomFrame, text="Close", bg=self.buttonBackground,
+			activebackground=self.buttonActiveBackground, command=lambda: diagnosticsWindow.destroy())
+		resetButton = self.formatted_buttons(bottomFrame, text="Reset", bg=self.buttonBackground,
+			activebackground=self.buttonActiveBackground, command=metrics.reset)
+		exportButton = self.formatted_buttons(bottomFrame, text="Export JSON", bg=self.buttonBackground,
+			activebackground=self.buttonActiveBackground, command=lambda: export_metrics())
+
+		# pack widgets
+		titleLabel.pack(side="top", anchor="n")
+		metricsText.pack(side="top", fill="both")
+
+		closeButton.pack(side="left", fill="x")
+		exportButton.pack(side="right", fill="x")
+		resetButton.pack(side="right", fill="x")
+
+		topFrame.pack(side="top", fill="both")
+		middleFrame.pack(side="top", fill="both")
+		bottomFrame.pack(side="top", fill="both")
+
+		def export_metrics():
+
+			path = filedialog.asksaveasfilename(parent=diagnosticsWindow,
+				defaultextension=".json", initialfile="zerotier-gui-metrics.json")
+			if not path:
+				return
+
+			with open(path, "w") as metricsFile:
+				metricsFile.write(dumps(metrics.snapshot(), indent=4))
+
+		# redrawn every second while the window is open
+		def show_metrics(lastText=None):
+
+			if not diagnosticsWindow.winfo_exists():
+				return
+
+			snapshot = metrics.snapshot()
+			text = "{}\n\n{}\n\nRefreshes: {} requested, {} fetched\nUptime: {} s".format(
+				format_table(
+					("Operation", "Count", "Errors", "Avg ms", "P50 ms", "P95 ms", "Max ms"),
+					[(name, operation['count'], operation['errors'], f"{operation['avg_ms']:.2f}",
+						operation['p50_ms'], operation['p95_ms'], f"{operation['max_ms']:.2f}")
+						for name, operation in sorted(snapshot['operations'].items())]
+				),
+				format_table(("Subprocess", "Started"), sorted(snapshot['subprocesses'].items())),
+				self.scheduler.requested, self.scheduler.fetched,
+				snapshot['uptime_s']
+			)
+
+			if text != lastText:
+				metricsText.config(state="normal")
+				metricsText.delete("1.0", "end")
+				metricsText.insert("1.0", text)
+				metricsText.config(state="disabled")
+
+			diagnosticsWindow.after(1000, show_metrics, text)
+
+		show_metrics()
+
+	@instrumented("get_interface_states")
+	def get_interface_states(self, interfaces=None):
+		return get_interface_states(interfaces)
 
 	def toggle_interface_connection(self):
 
 		# setting up
-		try:
-			idInList = self.networkList.curselection()[0]
-		except:
-			messagebox.showinfo(icon="info", title="Error", message="No network selected")
+		networkIds = self.selected_networks()
+		if networkIds is None:
 			return
 
-		# id in list will always be the same as id in json
-		# because the list is generated in the same order
-		currentNetworkInfo = self.get_networks_info()[idInList]
-		currentNetworkInterface = currentNetworkInfo['portDeviceName']
+		def set_links(results):
+
+			# network id -> (device, new state)
+			changes = {}
+			for networkId, network in results.items():
+				if isinstance(network, Exception):
+					continue
+				changes[networkId] = (network['portDeviceName'], None)
+
+			states = self.get_interface_states([device for device, newState in changes.values()])
+			for networkId, (device, newState) in changes.items():
+				changes[networkId] = (device, 'up' if states[device].lower() == "down" else 'down')
+
+			def show_result(linkResults):
+
+				# the helper answers for each device, ip keeps going
+				# after a failed one, so every device is checked for
+				# the state it should be in
+				linkResult = linkResults['link']
+				states = self.get_interface_states([device for device, newState in changes.values()])
+				for networkId, (device, newState) in changes.items():
+					error = linkResult.get(device) if isinstance(linkResult, dict) else linkResult
+					if isinstance(error, Exception):
+						results[networkId] = error
+					elif (states[device].lower() == "down") != (newState == 'down'):
+						results[networkId] = ZeroTierError(f"{device} is still {states[device].lower()}")
+					else:
+						results[networkId] = newState
+
+				self.show_batch_result("toggled interface" if len(results) == 1 else "toggled interfaces", results)
+				# the networks themselves didn't change
+				self.refresh_interface_states()
+
+			if not changes:
+				self.show_batch_result("toggled interfaces", results)
+				return
+
+			# every device goes through the helper or one ip batch, so
+			# there is one password prompt at most, which is given enough
+			# time to answer
+			if self.privilegedHelper is not None:
+				job = lambda: self.privilegedHelper.set_links(list(changes.values()))
+			else:
+				commands = "".join(f"link set {device} {newState}\n" for device, newState in changes.values())
+				job = self.engine.command(['pkexec', 'ip', '-force', '-batch', '-'], input=commands)
 
-		state = self.get_interface_state(currentNetworkInterface)
+			self.engine.submit({'link': job}, show_result, timeout=300)
 
-		if state.lower() == "down":
-			check_output(['pkexec', 'ip', 'link', 'set', currentNetworkInterface, 'up'])
-		else:
-			check_output(['pkexec', 'ip', 'link', 'set', currentNetworkInterface, 'down'])
+		self.engine.submit({
+			networkId: lambda networkId=networkId: self.store.network(networkId)
+			for networkId in networkIds
+		}, set_links)
 
-		self.refresh_networks()
-
-	def see_peer_paths(self, peerList):
+	def see_peer_paths(self, peerTable):
 
 		# setting up
-		try:
-			idInList = peerList.curselection()[0]
-		except:
+		peerAddress = peerTable.selected_key()
+		if peerAddress is None:
 			messagebox.showinfo(icon="info", title="Error", message="No peer selected")
 			return
 
-		pathsWindow = self.launch_sub_window("Peer Path")
+		# a path row of an expanded peer
+		if not isinstance(peerAddress, str):
+			peerAddress = peerAddress[0]
+
+		pathsWindow = self.reuse_sub_window("paths", "Peer Path", self.build_paths_window)
+		pathRows = pathsWindow.pathRows
+
+		# the window is bound to one peer at a time
+		if pathRows.peerAddress != peerAddress:
+			pathRows.peerAddress = peerAddress
+			pathRows.update([], self.format_path)
+			if pathsWindow.autoRefreshCheck.enabled.get():
+				pathsWindow.autoRefreshCheck.refresher.start()
+
+		# the peers window has just loaded this peer
+		self.refresh_paths(pathRows, peerAddress, maxAge=None)
+
+	def build_paths_window(self, pathsWindow):
 
 		# frames
 		topFrame = tk.Frame(pathsWindow, padx = 20, bg=self.background)
@@ -480,11 +3777,18 @@ class MainWindow:
 		pathsListScrollbar = tk.Scrollbar(middleFrame, bd=2)
 		pathsList = tk.Listbox(middleFrame, height="15", font="Monospace",
 			selectmode="single", relief="flat", bg="white", fg=self.foreground)
+		pathRows = ListboxRows(pathsList)
+		pathRows.peerAddress = None
 
 		closeButton = self.formatted_buttons(bottomFrame, text="Close", bg=self.buttonBackground,
-			activebackground=self.buttonActiveBackground, command=lambda: pathsWindow.destroy())
+			activebackground=self.buttonActiveBackground, command=lambda: self.hide_sub_window(pathsWindow))
 		refreshButton = self.formatted_buttons(bottomFrame, text="Refresh Paths", bg=self.buttonBackground,
-			activebackground=self.buttonActiveBackground, command=lambda: self.refresh_paths(pathsList, idInList))
+			activebackground=self.buttonActiveBackground,
+			command=lambda: self.refresh_paths(pathRows, pathRows.peerAddress))
+		autoRefreshCheck = self.auto_refresh_check(bottomFrame, AutoRefresher(
+			self.engine, pathsList, lambda: self.paths_jobs(pathRows.peerAddress),
+			lambda results: self.show_paths(pathRows, results['paths'])
+		))
 
 		# pack widgets
 		tableLabels.pack(side="left", fill="both")
@@ -494,6 +3798,7 @@ class MainWindow:
 
 		closeButton.pack(side="left", fill="x")
 		refreshButton.pack(side="right", fill="x")
+		autoRefreshCheck.pack(side="right", fill="x")
 
 		topFrame.pack(side="top", fill="x", pady = (30, 0))
 		middleFrame.pack(side="top", fill="x")
@@ -501,20 +3806,24 @@ class MainWindow:
 
 
 		# extra configuration
-		self.refresh_paths(pathsList, idInList)
-
 		pathsList.config(yscrollcommand=pathsListScrollbar.set)
 		pathsListScrollbar.config(command=pathsList.yview)
 
-		pathsWindow.mainloop()
+		pathsWindow.pathRows = pathRows
+		pathsWindow.autoRefreshCheck = autoRefreshCheck
+		pathsWindow.on_hide = lambda: self.stop_auto_refresh(autoRefreshCheck)
 
 
 	def see_peers(self):
 
-		def call_see_peer_paths(event):
-			self.see_peer_paths(peersList)
+		peersWindow = self.reuse_sub_window("peers", "Peers", self.build_peers_window)
 
-		peersWindow = self.launch_sub_window("Peers")
+		# the last run's peers fill the table until fresh ones arrive
+		if 'peers' not in self.store.snapshots and self.cached.get('peers'):
+			self.show_peers(peersWindow.peerTable, self.cached['peers'])
+		self.refresh_peers()
+
+	def build_peers_window(self, peersWindow):
 
 		# frames
 		topFrame = tk.Frame(peersWindow, padx = 20, bg=self.background)
@@ -522,75 +3831,159 @@ class MainWindow:
 		bottomFrame = tk.Frame(peersWindow, padx = 20, pady = 10, bg=self.background)
 
 		# widgets
-		tableLabels = tk.Label(topFrame, font="Monospace",
-			bg="grey", fg=self.foreground,
-			text="{:13s}{:13s}{:13s}{:13s}".format(
-				"ZT Address",
-				"Version",
-				"Role",
-				"Latency"
-			)
-		)
-
-		peersListScrollbar = tk.Scrollbar(middleFrame, bd=2)
-		peersList = tk.Listbox(middleFrame, width="50", height="15",
-			font="Monospace", selectmode="single", relief="flat",
-			bg="white", fg=self.foreground
-		)
-
-		peersList.bind('<Double-Button-1>', call_see_peer_paths)
+		filterLabel = tk.Label(topFrame, text="Filter:", bg=self.background, fg=self.foreground)
+		peerFilter = tk.StringVar()
+		filterEntry = tk.Entry(topFrame, textvariable=peerFilter, font="Monospace")
+
+		peerTable = VirtualTable(middleFrame, height=15, background=self.background, columns=(
+			("ZT Address", 330),
+			("Version", 100),
+			("Role", 90),
+			("Latency", 80),
+			("History", 250),
+			("Min", 60),
+			("Avg", 60),
+			("P95", 60),
+			("Paths", 60)
+		))
+		peerTable.version = None
+		self.peerTables.append(peerTable)
+
+		# history starts being recorded once peers are first looked at
+		if not self.latencySampler.running:
+			self.latencySampler.running = True
+			self.sample_latency()
+
+		# double click shows the paths of a peer under it
+		peerTable.on_activate = lambda key: self.toggle_peer_paths(peerTable, key)
+		peerTable.on_sort = lambda: self.filter_peers(peerTable)
+
+		def filter_peers(*args):
+			peerTable.filterText = peerFilter.get()
+			peerTable.offset = 0
+			self.filter_peers(peerTable)
+
+		peerFilter.trace_add("write", filter_peers)
+		# keeps the variable alive as long as the widget
+		filterEntry.filterVariable = peerFilter
 
 		closeButton = self.formatted_buttons(bottomFrame, text="Close", bg=self.buttonBackground,
-			activebackground=self.buttonActiveBackground, command=lambda: peersWindow.destroy()
+			activebackground=self.buttonActiveBackground, command=lambda: self.hide_sub_window(peersWindow)
 		)
 		refreshButton = self.formatted_buttons(bottomFrame, text="Refresh Peers", bg=self.buttonBackground,
-			activebackground=self.buttonActiveBackground, command=lambda: self.refresh_peers(peersList)
+			activebackground=self.buttonActiveBackground, command=self.refresh_peers
 		)
 		seePathsButton = self.formatted_buttons(bottomFrame, text="See Paths", bg=self.buttonBackground,
-			activebackground=self.buttonActiveBackground, command=lambda: self.see_peer_paths(peersList)
+			activebackground=self.buttonActiveBackground, command=lambda: self.see_peer_paths(peerTable)
 		)
+		autoRefreshCheck = self.auto_refresh_check(bottomFrame, AutoRefresher(
+			self.engine, peerTable.tree, None, None, scheduler=self.scheduler, kind='peers'
+		))
 
 		# pack widgets
-		tableLabels.pack(side="left", fill="both")
+		filterLabel.pack(side="left")
+		filterEntry.pack(side="left", fill="x", expand=True)
 
-		peersListScrollbar.pack(side="right", fill="both")
-		peersList.pack(side="bottom", fill="x")
+		peerTable.pack(side="top", fill="both")
 
 		closeButton.pack(side="left", fill="x")
 		refreshButton.pack(side="right", fill="x")
 		seePathsButton.pack(side="right", fill="x")
+		autoRefreshCheck.pack(side="right", fill="x")
 
-		topFrame.pack(side="top", fill="x", pady = (30, 0))
+		topFrame.pack(side="top", fill="x", pady = (30, 10))
 		middleFrame.pack(side="top", fill="x")
 		bottomFrame.pack(side="top", fill="x")
 
+		peersWindow.peerTable = peerTable
+		peersWindow.on_hide = lambda: self.stop_auto_refresh(autoRefreshCheck)
 
-		# extra configuration
-		self.refresh_peers(peersList)
+	def see_network_info(self):
 
-		peersList.config(yscrollcommand=peersListScrollbar.set)
-		peersListScrollbar.config(command=peersList.yview)
+		# setting up
+		networkIds = self.selected_networks()
+		if networkIds is None:
+			return
+		if len(networkIds) > 1:
+			self.batch_settings_window(networkIds)
+			return
+		networkId = networkIds[0]
 
-		peersWindow.mainloop()
+		def show_network_info(results):
+			if not self.failed(results['network']):
+				self.show_network_info(results['network'])
 
-	def see_network_info(self):
+		self.engine.submit({'network': lambda: self.store.network(networkId)}, show_network_info)
 
-		# setting up
-		try:
-			idInList = self.networkList.curselection()[0]
-		except:
-			messagebox.showinfo(icon="info", title="Error", message="No network selected")
+	def show_network_info(self, currentNetworkInfo):
+
+		infoWindow = self.reuse_sub_window("info", "Network Info", self.build_network_info_window)
+		infoWindow.networkId = currentNetworkInfo['id']
+		self.update_network_info(infoWindow, currentNetworkInfo)
+
+	# a shown info window follows every new networks snapshot
+	def refresh_network_info(self, networkData):
+
+		infoWindow = self.subWindows.get("info")
+		if infoWindow is None or not infoWindow.winfo_exists() or infoWindow.state() == "withdrawn":
 			return
 
-		infoWindow = self.launch_sub_window("Network Info")
+		for network in networkData:
+			if network['id'] == infoWindow.networkId:
+				self.update_network_info(infoWindow, network)
+				return
+
+	# only the fields whose text changed are touched
+	def update_network_info(self, infoWindow, network):
+
+		texts = {field: "{:25s}{}".format(text.label, network[field])
+			for field, text in infoWindow.fields.items()}
+		texts['state'] = "{:25s}{}".format("State:", self.interfaceStates.get(network['portDeviceName'], "-"))
+
+		for field, text in texts.items():
+			if infoWindow.shown.get(field) != text:
+				infoWindow.shown[field] = text
+				self.set_text(infoWindow.fields.get(field, infoWindow.stateLabel), text)
+
+		# a setting waiting for the service keeps its check as it is
+		for config, (variable, check) in infoWindow.checks.items():
+			pending = (infoWindow.networkId, config) in infoWindow.pending
+			if check.pending != pending:
+				self.set_pending(check, pending)
+			if not pending and variable.get() != bool(network[config]):
+				variable.set(network[config])
 
-		# id in list will always be the same as id in json
-		# because the list is generated in the same order
-		currentNetworkInfo = self.get_networks_info()[idInList]
+		addresses = tuple(network['assignedAddresses'])
+		if infoWindow.shown.get('assignedAddresses') != addresses:
+			infoWindow.shown['assignedAddresses'] = addresses
+			self.show_assigned_addresses(infoWindow, addresses)
+
+	def set_pending(self, check, pending):
+		check.pending = pending
+		check.config(state="disabled" if pending else "normal")
+
+	# one line per address, lines are kept around and reused
+	def show_assigned_addresses(self, infoWindow, addresses):
+
+		lines = infoWindow.addressLines
+		texts = ["{:25s}{}".format("Assigned Addresses:", addresses[0] if addresses else "-")]
+		texts += ["{:>42s}".format(address) for address in addresses[1:]]
+
+		while len(lines) < len(texts):
+			lines.append(self.selectable_text(infoWindow.addressFrame, "", font="Monospace"))
+
+		for line, text in zip(lines, texts):
+			self.set_text(line, text)
+			line.pack(side="top", anchor="w")
+		for line in lines[len(texts):]:
+			line.pack_forget()
+
+	def build_network_info_window(self, infoWindow):
 
 		# frames
 		topFrame = tk.Frame(infoWindow, pady=30, bg=self.background)
 		middleFrame = tk.Frame(infoWindow, padx=20, bg=self.background)
+		addressFrame = tk.Frame(middleFrame, bg=self.background)
 
 		allowDefaultFrame = tk.Frame(infoWindow, padx=20, bg=self.background)
 		allowGlobalFrame = tk.Frame(infoWindow, padx=20, bg=self.background)
@@ -603,82 +3996,36 @@ class MainWindow:
 		allowGlobal = tk.BooleanVar()
 		allowManaged = tk.BooleanVar()
 
-		allowDefault.set(currentNetworkInfo['allowDefault'])
-		allowGlobal.set(currentNetworkInfo['allowGlobal'])
-		allowManaged.set(currentNetworkInfo['allowManaged'])
-
-		# assigned addresses widget generation
-		try:
-
-			assignedAddressesWidgets = []
-
-			# first widget
-			assignedAddressesWidgets.append(
-				self.selectable_text(
-					middleFrame,
-					"{:25s}{}".format("Assigned Addresses:",
-						currentNetworkInfo['assignedAddresses'][0]),
-					font="Monospace"
-				)
-			)
-
-			# subsequent widgets
-			for address in currentNetworkInfo['assignedAddresses'][1:]:
-				assignedAddressesWidgets.append(
-					self.selectable_text(
-						middleFrame,
-						"{:>42s}".format(address),
-						font="Monospace"
-					)
-				)
-
-		except IndexError:
-
-			assignedAddressesWidgets.append(
-				self.selectable_text(middleFrame, "{:25s}{}".format("Assigned Addresses:", "-"), font="Monospace")
-			)
-
 		# widgets
 		titleLabel = tk.Label(topFrame, text="Network Info", font=70,
 			bg=self.background, fg=self.foreground)
 
-		nameLabel = self.selectable_text(middleFrame, font="Monospace",
-			text="{:25s}{}".format("Name:", currentNetworkInfo['name']))
-		idLabel = self.selectable_text(middleFrame, font="Monospace",
-			text="{:25s}{}".format("Network ID:", currentNetworkInfo['id']))
-		statusLabel = tk.Label(middleFrame, font="Monospace",
-			text="{:25s}{}".format("Status:", currentNetworkInfo['status']),
-			bg=self.background, fg=self.foreground
-		)
-		stateLabel = tk.Label(middleFrame, font="Monospace",
-			text="{:25s}{}".format("State:", self.get_interface_state(currentNetworkInfo['portDeviceName'])),
-			bg=self.background, fg=self.foreground
-		)
-		typeLabel = tk.Label(middleFrame, font="Monospace",
-			text="{:25s}{}".format("Type:", currentNetworkInfo['type']),
-			bg=self.background, fg=self.foreground
-		)
-		deviceLabel = self.selectable_text(middleFrame, font="Monospace",
-			text="{:25s}{}".format("Device:", currentNetworkInfo['portDeviceName']))
-		bridgeLabel = tk.Label(middleFrame, font="Monospace",
-			text="{:25s}{}".format("Bridge:", currentNetworkInfo['bridge']),
-			bg=self.background, fg=self.foreground
-		)
-		macLabel = self.selectable_text(middleFrame, font="Monospace",
-			text="{:25s}{}".format("MAC Address:", currentNetworkInfo['mac']))
-		mtuLabel = self.selectable_text(middleFrame, font="Monospace",
-			text="{:25s}{}".format("MTU:", currentNetworkInfo['mtu']))
-		dhcpLabel = tk.Label(middleFrame, font="Monospace",
-			text="{:25s}{}".format("DHCP:", currentNetworkInfo['dhcp']),
-			bg=self.background, fg=self.foreground
-		)
+		def field_text(label, selectable=False):
+			if selectable:
+				text = self.selectable_text(middleFrame, font="Monospace", text=label)
+			else:
+				text = tk.Label(middleFrame, font="Monospace", text=label,
+					bg=self.background, fg=self.foreground)
+			text.label = label
+			return text
+
+		nameLabel = field_text("Name:", selectable=True)
+		idLabel = field_text("Network ID:", selectable=True)
+		statusLabel = field_text("Status:")
+		stateLabel = field_text("State:")
+		typeLabel = field_text("Type:")
+		deviceLabel = field_text("Device:", selectable=True)
+		bridgeLabel = field_text("Bridge:")
+		macLabel = field_text("MAC Address:", selectable=True)
+		mtuLabel = field_text("MTU:", selectable=True)
+		dhcpLabel = field_text("DHCP:")
 
 		allowDefaultLabel = tk.Label(allowDefaultFrame, font="Monospace",
 			text="{:24s}".format("Allow Default Route"),
 			bg=self.background, fg=self.foreground
 		)
 		allowDefaultCheck = tk.Checkbutton(allowDefaultFrame, variable=allowDefault,
-			command=lambda: change_config("allowDefault", allowDefault.get()),
+			command=lambda: change_config("allowDefault"),
 			bg=self.background, fg=self.foreground
 		)
 
@@ -687,7 +4034,7 @@ class MainWindow:
 			bg=self.background, fg=self.foreground
 		)
 		allowGlobalCheck = tk.Checkbutton(allowGlobalFrame, variable=allowGlobal,
-			command=lambda: change_config("allowGlobal", allowGlobal.get()),
+			command=lambda: change_config("allowGlobal"),
 			bg=self.background, fg=self.foreground
 		)
 
@@ -696,12 +4043,12 @@ class MainWindow:
 			bg=self.background, fg=self.foreground
 		)
 		allowManagedCheck = tk.Checkbutton(allowManagedFrame, variable=allowManaged,
-			command=lambda: change_config("allowManaged", allowManaged.get()),
+			command=lambda: change_config("allowManaged"),
 			bg=self.background, fg=self.foreground
 		)
 
 		closeButton = self.formatted_buttons(bottomFrame, text="Close", bg=self.buttonBackground,
-			activebackground=self.buttonActiveBackground, command=lambda: infoWindow.destroy())
+			activebackground=self.buttonActiveBackground, command=lambda: self.hide_sub_window(infoWindow))
 
 		# pack widgets
 		titleLabel.pack(side="top", anchor="n")
@@ -709,9 +4056,8 @@ class MainWindow:
 		nameLabel.pack(side="top", anchor="w")
 		idLabel.pack(side="top", anchor="w")
 
-			# assigned addresses
-		for widget in assignedAddressesWidgets:
-			widget.pack(side="top", anchor="w")
+		# assigned addresses
+		addressFrame.pack(side="top", anchor="w")
 
 		statusLabel.pack(side="top", anchor="w")
 		stateLabel.pack(side="top", anchor="w")
@@ -742,32 +4088,557 @@ class MainWindow:
 
 		bottomFrame.pack(side="top", fill="both")
 
-		# checkbutton functions
-		def change_config(config, value):
+		# checkbutton functions. the check is disabled until the
+		# service answers, then shows the value it confirmed
+		def change_config(config):
+
+			networkId = infoWindow.networkId
+			variable, check = infoWindow.checks[config]
+			value = variable.get()
+			infoWindow.pending.add((networkId, config))
+			self.set_pending(check, True)
+
+			def confirmed(results):
+				infoWindow.pending.discard((networkId, config))
+				if not infoWindow.winfo_exists():
+					return
+				if infoWindow.networkId == networkId:
+					self.set_pending(check, False)
+
+				network = results['set']
+				if self.failed(network):
+					# back to what the service last reported
+					network = self.store.networksById.get(networkId)
+				if network is not None and infoWindow.networkId == networkId:
+					self.update_network_info(infoWindow, network)
+
+				self.refresh_networks()
+
+			self.engine.submit({'set': lambda: self.store.set_config(networkId, config, value)}, confirmed)
+
+		# what every showing of the window fills in, the check variables
+		# also need to live as long as the window
+		infoWindow.networkId = None
+		# field -> text on screen, and the (network id, setting) pairs
+		# sent to the service and not answered yet
+		infoWindow.shown = {}
+		infoWindow.pending = set()
+		for check in (allowDefaultCheck, allowGlobalCheck, allowManagedCheck):
+			check.pending = False
+		infoWindow.fields = {
+			'name': nameLabel,
+			'id': idLabel,
+			'status': statusLabel,
+			'type': typeLabel,
+			'portDeviceName': deviceLabel,
+			'bridge': bridgeLabel,
+			'mac': macLabel,
+			'mtu': mtuLabel,
+			'dhcp': dhcpLabel
+		}
+		infoWindow.stateLabel = stateLabel
+		infoWindow.checks = {
+			'allowDefault': (allowDefault, allowDefaultCheck),
+			'allowGlobal': (allowGlobal, allowGlobalCheck),
+			'allowManaged': (allowManaged, allowManagedCheck)
+		}
+		infoWindow.addressFrame = addressFrame
+		infoWindow.addressLines = []
+
+	# networks and members of the controller in the local service
+	def controller_window(self):
+
+		if self.controller is None:
+			self.controller = Controller(self.api)
+		controller = self.controller
+
+		controllerWindow = self.launch_sub_window("Controller")
 
-			# zerotier-cli only accepts int values
-			value = int(value)
+		# frames
+		topFrame = tk.Frame(controllerWindow, padx=20, pady=10, bg=self.background)
+		middleFrame = tk.Frame(controllerWindow, padx=20, bg=self.background)
+		filterFrame = tk.Frame(controllerWindow, padx=20, pady=10, bg=self.background)
+		membersFrame = tk.Frame(controllerWindow, padx=20, bg=self.background)
+		bottomFrame = tk.Frame(controllerWindow, padx=20, pady=10, bg=self.background)
 
-			try:
+		# widgets
+		networksLabel = tk.Label(topFrame, text="Controller Networks:", font=40,
+			bg=self.background, fg=self.foreground)
+		networkTable = VirtualTable(middleFrame, height=5, background=self.background, columns=(
+			("Network ID", 180),
+			("Name", 300),
+			("Private", 80),
+			("Members", 80)
+		))
+
+		membersLabel = tk.Label(filterFrame, text="Members:", font=40, bg=self.background, fg=self.foreground)
+		filterLabel = tk.Label(filterFrame, text="Filter:", bg=self.background, fg=self.foreground)
+		memberFilter = tk.StringVar()
+		filterEntry = tk.Entry(filterFrame, textvariable=memberFilter, font="Monospace")
+
+		memberTable = VirtualTable(membersFrame, height=15, background=self.background, columns=(
+			("Member ID", 130),
+			("Name", 200),
+			("Authorized", 90),
+			("IP Assignments", 320),
+			("Revision", 80)
+		))
+		memberTable.tree.tag_configure("unauthorized", foreground="red")
+		memberTable.networkId = None
+
+		def selected_network():
+			if memberTable.networkId is None:
+				messagebox.showinfo(icon="info", title="Error", message="No network selected")
+			return memberTable.networkId
+
+		def show_networks(results):
+			if not controllerWindow.winfo_exists():
+				return
+			if self.failed(results['networks']):
+				controllerWindow.destroy()
+				return
+
+			rows = [(network['id'], (network['id'], network.get('name') or "No name",
+				bool(network.get('private')), network['memberCount'])) for network in results['networks']]
+			networkTable.index = RowIndex(rows, {
+				"Network ID": lambda record: record[0],
+				"Name": lambda record: record[1].lower(),
+				"Private": lambda record: record[2],
+				"Members": lambda record: record[3]
+			}, lambda record: (record[0], record[1]))
+			filter_table(networkTable, format_network)
+
+			# the first network is shown right away
+			if memberTable.networkId is None and rows:
+				show_members_of(rows[0][0])
+
+		def show_members_of(networkId):
+			memberTable.networkId = networkId
+			memberTable.offset = 0
+			membersLabel.config(text=f"Members of {networkId}:")
+			membersRefresher.start()
+
+		def show_members(results):
+
+			members = results['members']
+			rows = [(member.id, (member.id, member.name or "", member.authorized,
+				", ".join(member.ipAssignments), member.revision)) for member in members]
+
+			memberTable.index = RowIndex(rows, {
+				"Member ID": lambda record: record[0],
+				"Name": lambda record: record[1].lower(),
+				"Authorized": lambda record: record[2],
+				"IP Assignments": lambda record: record[3],
+				"Revision": lambda record: record[4]
+			}, lambda record: (record[0], record[1], *record[3].split(", ")))
+			filter_table(memberTable, format_member)
+
+		def filter_table(table, formatter):
+			if table.index is None:
+				return
+			rows = table.index.rows
+			positions = table.index.select(table.filterText, table.sortColumn, table.sortReverse)
+			table.update([rows[position] for position in positions], formatter)
+
+		def format_network(record):
+			networkId, name, private, memberCount = record
+			return (networkId, name, "yes" if private else "no", str(memberCount)), ()
+
+		def format_member(record):
+			memberId, name, authorized, addresses, revision = record
+			return (memberId, name, "yes" if authorized else "no", addresses, str(revision)), \
+				() if authorized else ("unauthorized",)
+
+		def filter_members(*args):
+			memberTable.filterText = memberFilter.get()
+			memberTable.offset = 0
+			filter_table(memberTable, format_member)
+
+		# members shown by the filter, or the selected one
+		def authorize(authorized, everyShown=False):
+
+			networkId = selected_network()
+			if networkId is None:
+				return
+
+			if everyShown:
+				memberIds = [key for key, record in memberTable.rows]
+				action = "authorize" if authorized else "deauthorize"
+				if not memberIds or not messagebox.askyesno(title="Controller",
+					message=f"Are you sure you want to {action} these {len(memberIds)} members?"):
+					return
+			else:
+				memberId = memberTable.selected_key()
+				if memberId is None:
+					messagebox.showinfo(icon="info", title="Error", message="No member selected")
+					return
+				memberIds = [memberId]
+
+			def show_result(results):
+				if not self.failed(results['authorize']):
+					self.show_batch_result("authorized members" if authorized else "deauthorized members",
+						results['authorize'])
+				membersRefresher.start()
+
+			# the controller sends them side by side, so a large batch
+			# still fits in a few timeouts
+			self.engine.submit({'authorize': lambda: controller.authorize(networkId, memberIds, authorized)},
+				show_result, timeout=self.engine.timeout + len(memberIds) // 10)
+
+		def edit_ip_assignments():
+
+			networkId = selected_network()
+			memberId = memberTable.selected_key()
+			if networkId is None:
+				return
+			if memberId is None:
+				messagebox.showinfo(icon="info", title="Error", message="No member selected")
+				return
+
+			member = controller.members.get(networkId, {}).get(memberId)
+			addresses = simpledialog.askstring("IP Assignments",
+				f"IP addresses of {memberId}, separated by commas:", parent=controllerWindow,
+				initialvalue=", ".join(member.ipAssignments) if member else "")
+			if addresses is None:
+				return
+			addresses = [address.strip() for address in addresses.split(",") if address.strip()]
+
+			def show_result(results):
+				if not self.failed(results['set']):
+					membersRefresher.start()
+
+			self.engine.submit({'set': lambda: controller.set_ip_assignments(networkId, memberId, addresses)},
+				show_result)
+
+		networkTable.on_activate = show_members_of
+		networkTable.on_sort = lambda: filter_table(networkTable, format_network)
+		memberTable.on_activate = lambda key: edit_ip_assignments()
+		memberTable.on_sort = lambda: filter_table(memberTable, format_member)
+		memberFilter.trace_add("write", filter_members)
+
+		# unchanged members cost one small request per refresh
+		membersRefresher = AutoRefresher(self.engine, memberTable.tree,
+			lambda: {'members': lambda: controller.refresh_members(memberTable.networkId)},
+			show_members, minInterval=2000, maxInterval=30000)
+
+		closeButton = self.formatted_buttons(bottomFrame, text="Close", bg=self.buttonBackground,
+			activebackground=self.buttonActiveBackground, command=lambda: controllerWindow.destroy())
+		refreshButton = self.formatted_buttons(bottomFrame, text="Refresh", bg=self.buttonBackground,
+			activebackground=self.buttonActiveBackground, command=lambda: refresh_networks())
+		authorizeButton = self.formatted_buttons(bottomFrame, text="Authorize", bg=self.buttonBackground,
+			activebackground=self.buttonActiveBackground, command=lambda: authorize(True))
+		deauthorizeButton = self.formatted_buttons(bottomFrame, text="Deauthorize", bg=self.buttonBackground,
+			activebackground=self.buttonActiveBackground, command=lambda: authorize(False))
+		authorizeShownButton = self.formatted_buttons(bottomFrame, text="Authorize All Shown", bg=self.buttonBackground,
+			activebackground=self.buttonActiveBackground, command=lambda: authorize(True, everyShown=True))
+		ipButton = self.formatted_buttons(bottomFrame, text="Edit IPs", bg=self.buttonBackground,
+			activebackground=self.buttonActiveBackground, command=edit_ip_assignments)
+
+		def refresh_networks():
+			self.engine.submit({'networks': controller.networks}, show_networks)
+			if memberTable.networkId is not None:
+				membersRefresher.start()
+
+		# pack widgets
+		networksLabel.pack(side="left")
+		networkTable.pack(side="top", fill="both")
+
+		membersLabel.pack(side="left")
+		filterEntry.pack(side="right")
+		filterLabel.pack(side="right")
+		memberTable.pack(side="top", fill="both")
+
+		closeButton.pack(side="left", fill="x")
+		refreshButton.pack(side="right", fill="x")
+		ipButton.pack(side="right", fill="x")
+		deauthorizeButton.pack(side="right", fill="x")
+		authorizeButton.pack(side="right", fill="x")
+		authorizeShownButton.pack(side="right", fill="x")
+
+		topFrame.pack(side="top", fill="x")
+		middleFrame.pack(side="top", fill="x")
+		filterFrame.pack(side="top", fill="x")
+		membersFrame.pack(side="top", fill="x")
+		bottomFrame.pack(side="top", fill="x")
+
+		refresh_networks()
 
-				check_output(['zerotier-cli', 'set', currentNetworkInfo['id'], f"{config}={value}"],
-					stderr=STDOUT)
+	# the network info checkboxes, applied to several networks at once
+	def batch_settings_window(self, networkIds):
 
-			except CalledProcessError as error:
+		networks = {network['id']: network for network in self.networkData}
 
-				error = error.output.decode().strip()
+		settingsWindow = self.launch_sub_window("Network Settings")
 
-				messagebox.showinfo(
-					title="Error",
-					message=f"Error: \"{error}\"",
-					icon="error"
-				)
+		# frames
+		topFrame = tk.Frame(settingsWindow, pady=30, padx=20, bg=self.background)
+		checkFrame = tk.Frame(settingsWindow, padx=20, bg=self.background)
+		bottomFrame = tk.Frame(settingsWindow, pady=10, bg=self.background)
+
+		titleLabel = tk.Label(topFrame, text=f"Settings of {len(networkIds)} Networks", font=70,
+			bg=self.background, fg=self.foreground)
+		titleLabel.pack(side="top", anchor="n")
+
+		def change_config(config, variable):
+
+			value = bool(variable.get())
+			for check in checks:
+				check.config(state="disabled")
+
+			def show_result(results):
+				self.show_batch_result(f"set {config}", results)
+				self.refresh_networks()
+				if settingsWindow.winfo_exists():
+					for check in checks:
+						check.config(state="normal")
+
+			self.engine.submit({
+				networkId: lambda networkId=networkId: self.store.set_config(networkId, config, value, confirm=False)
+				for networkId in networkIds
+			}, show_result)
+
+		checks = []
+		checkVariables = []
+		for config, text in (("allowDefault", "Allow Default Route"),
+			("allowGlobal", "Allow Global IP"), ("allowManaged", "Allow Managed IP")):
+
+			# shown as mixed while the networks disagree
+			values = {bool(networks[networkId][config]) for networkId in networkIds if networkId in networks}
+			variable = tk.IntVar(value=int(values.pop()) if len(values) == 1 else -1)
+
+			frame = tk.Frame(checkFrame, bg=self.background)
+			label = tk.Label(frame, font="Monospace", text="{:24s}".format(text),
+				bg=self.background, fg=self.foreground)
+			check = tk.Checkbutton(frame, variable=variable, onvalue=1, offvalue=0, tristatevalue=-1,
+				command=lambda config=config, variable=variable: change_config(config, variable),
+				bg=self.background, fg=self.foreground
+			)
+
+			label.pack(side="left", anchor="w")
+			check.pack(side="left", anchor="w")
+			frame.pack(side="top", fill="both")
+
+			checks.append(check)
+			checkVariables.append(variable)
+
+		closeButton = self.formatted_buttons(bottomFrame, text="Close", bg=self.buttonBackground,
+			activebackground=self.buttonActiveBackground, command=lambda: settingsWindow.destroy())
+		closeButton.pack(side="top")
+
+		topFrame.pack(side="top", fill="both")
+		checkFrame.pack(side="top", fill="both")
+		bottomFrame.pack(side="top", fill="both")
 
 		# needed to stop local variables from being destroyed before the window
-		infoWindow.mainloop()
+		settingsWindow.checkVariables = checkVariables
+
+# the networks and peers of many nodes side by side, with the health
+# of each node. nodes are polled on their own pool, so a hundred slow
+# ones never block the window
+class Dashboard:
+
+	def __init__(self, window, nodes, limit=16):
+
+		self.window = window
+		self.window.title(f"ZeroTier Dashboard ({len(nodes)} nodes)")
+		self.nodes = nodes
+		self.limit = limit
+		self.executor = ThreadPoolExecutor(max_workers=limit)
+
+		# a poll takes at most as long as its slowest wave of nodes
+		waves = -(-len(nodes) // limit)
+		self.engine = BackendEngine(window, workers=1,
+			timeout=waves * max(node.timeout for node in nodes) + 5)
+
+		self.background = "#d9d9d9"
+		self.foreground = "black"
+		self.buttonBackground = "#ffb253"
+		self.buttonActiveBackground = "#ffbf71"
+
+		# frames
+		topFrame = tk.Frame(window, padx=20, pady=10, bg=self.background)
+		middleFrame = tk.Frame(window, padx=20, bg=self.background)
+		bottomFrame = tk.Frame(window, padx=20, pady=10, bg=self.background)
+
+		# widgets
+		self.summaryLabel = tk.Label(topFrame, text=f"Polling {len(nodes)} nodes...", font=40,
+			bg=self.background, fg=self.foreground)
+		filterLabel = tk.Label(topFrame, text="Filter:", bg=self.background, fg=self.foreground)
+		self.filterText = tk.StringVar()
+		self.filterText.trace_add("write", lambda *args: self.filter_tables())
+		filterEntry = tk.Entry(topFrame, textvariable=self.filterText, font="Monospace", width=30)
+
+		notebook = ttk.Notebook(middleFrame)
+		self.tables = {}
+		for kind, widths in (('nodes', (140, 200, 260, 100, 70, 70, 60, 70)),
+			('networks', (140, 160, 260, 220, 80, 100)), ('peers', (140, 120, 80, 80, 70, 60))):
+
+			frame = tk.Frame(notebook, bg=self.background)
+			table = VirtualTable(frame, height=20, background=self.background,
+				columns=tuple(zip(DASHBOARD_COLUMNS[kind], widths)))
+			table.tree.tag_configure("error", foreground="red")
+			table.on_sort = lambda table=table: self.filter_table(table)
+			table.pack(side="top", fill="both", expand=True)
+
+			notebook.add(frame, text=kind.capitalize())
+			self.tables[kind] = table
+
+		refreshButton = tk.Button(bottomFrame, text="Refresh", command=self.refresh,
+			bg=self.buttonBackground, activebackground=self.buttonActiveBackground, fg=self.foreground)
+		self.refresher = AutoRefresher(self.engine, window, self.jobs, self.show,
+			minInterval=5000, maxInterval=60000)
+
+		# pack widgets
+		self.summaryLabel.pack(side="left")
+		filterEntry.pack(side="right")
+		filterLabel.pack(side="right")
+		notebook.pack(side="top", fill="both", expand=True)
+		refreshButton.pack(side="right")
+
+		topFrame.pack(side="top", fill="x")
+		middleFrame.pack(side="top", fill="both", expand=True)
+		bottomFrame.pack(side="top", fill="x")
+
+		self.refresher.start()
+
+	def jobs(self):
+		return {'nodes': poll_nodes(self.nodes, self.executor, self.limit)}
+
+	def refresh(self):
+		self.refresher.start()
+
+	@instrumented("render dashboard")
+	def show(self, results):
+
+		nodeResults = results['nodes']
+		online = sum(1 for result in nodeResults
+			if 'error' not in result and result['status'].get('online'))
+		nodeRows, networkRows, peerRows = dashboard_rows(nodeResults)
+
+		self.summaryLabel.config(text=f"{online} of {len(nodeResults)} nodes online, "
+			f"{len(networkRows)} networks, {len(peerRows)} peers")
+
+		self.tables['nodes'].index = RowIndex(nodeRows,
+			{name: lambda record, column=column: record[column]
+				for column, name in enumerate(DASHBOARD_COLUMNS['nodes'])},
+			lambda record: (record[0], record[3]))
+		self.tables['networks'].index = RowIndex(networkRows,
+			{name: lambda record, column=column: str(record[column])
+				for column, name in enumerate(DASHBOARD_COLUMNS['networks'])},
+			lambda record: (record[0], record[1], *record[2].split()))
+		self.tables['peers'].index = RowIndex(peerRows, {
+			"Node": lambda record: record[0],
+			"ZT Address": lambda record: record[1],
+			"Version": lambda record: version_key(record[2]),
+			"Role": lambda record: record[3],
+			"Latency": lambda record: latency_key(record[4]),
+			"Paths": lambda record: record[5]
+		}, lambda record: (record[0], record[1]))
+
+		self.filter_tables()
+
+	def filter_tables(self):
+		for table in self.tables.values():
+			table.filterText = self.filterText.get()
+			table.offset = 0
+			self.filter_table(table)
+
+	def filter_table(self, table):
+		if table.index is None:
+			return
+		rows = table.index.rows
+		positions = table.index.select(table.filterText, table.sortColumn, table.sortReverse)
+		formatter = self.format_node if table is self.tables['nodes'] else self.format_row
+		table.update([rows[position] for position in positions], formatter)
+
+	def format_row(self, record):
+		return tuple(str(value) for value in record), ()
+
+	# unhealthy nodes are shown in red
+	def format_node(self, record):
+		return tuple(str(value) for value in record), ("error",) if record[2].startswith("ERROR") else ()
+
+	def stop(self):
+		self.refresher.stop()
+		for node in self.nodes:
+			node.stop()
 
 if __name__ == "__main__":
 
+	parser = ArgumentParser(description="A Linux front-end for ZeroTier")
+	parser.add_argument("--headless", action="store_true",
+		help="print to the terminal instead of opening the gui")
+	parser.add_argument("--show", choices=("networks", "peers", "paths", "status", "nodes"), default="networks",
+		help="what headless mode prints (default: networks)")
+	parser.add_argument("--json", action="store_true",
+		help="print json instead of a table in headless mode")
+	parser.add_argument("--watch", type=float, metavar="SECONDS",
+		help="keep printing in headless mode, whenever the output changes")
+	parser.add_argument("--join-file", metavar="FILE",
+		help="join and configure the networks listed in a json, yaml or text file, without the gui")
+	parser.add_argument("--join-timeout", type=float, default=60, metavar="SECONDS",
+		help="how long --join-file waits for the networks to be OK (default: 60)")
+	parser.add_argument("--nodes", metavar="FILE",
+		help="show many nodes at once, listed in a json, yaml or text file")
+	parser.add_argument("--node-timeout", type=float, default=5, metavar="SECONDS",
+		help="how long --nodes waits for each node (default: 5)")
+	parser.add_argument("--cache-ttl", type=float, default=2, metavar="SECONDS",
+		help="how long the gui reuses data it has fetched (default: 2)")
+	parser.add_argument("--no-cache", action="store_true",
+		help="don't paint or save the last snapshot kept in the user's cache directory")
+	parser.add_argument("--no-link-watch", action="store_true",
+		help="only update interface states on refresh, instead of as they change")
+	parser.add_argument("--privileged-helper", action="store_true",
+		help="ask for a password once and keep a helper around for interface changes")
+	parser.add_argument("--link-helper", metavar="NAME", help=SUPPRESS)
+	parser.add_argument("--startup-timing", action="store_true",
+		help="print how long the gui took to first paint")
+	parser.add_argument("--profile", metavar="FILE",
+		help="write cProfile stats of the main thread to FILE on exit")
+	arguments = parser.parse_args()
+
+	if arguments.nodes and arguments.show in ("paths", "status"):
+		parser.error("--nodes shows nodes, networks or peers")
+	if arguments.show == "nodes" and not arguments.nodes:
+		parser.error("--show nodes needs --nodes")
+
+	if arguments.profile:
+		from cProfile import Profile
+		from atexit import register
+
+		profiler = Profile()
+
+		def dump_profile():
+			profiler.disable()
+			profiler.dump_stats(arguments.profile)
+
+		register(dump_profile)
+		profiler.enable()
+
+	if arguments.link_helper:
+		exit(run_link_helper(arguments.link_helper))
+
+	if arguments.join_file:
+		exit(run_join_manifest(arguments))
+
+	if arguments.headless:
+		exit(run_headless(arguments))
+
+	load_tkinter()
+
+	if arguments.nodes:
+		try:
+			nodes = read_nodes(arguments.nodes, arguments.node_timeout)
+		except (ZeroTierError, OSError) as error:
+			print(f"Error: {error}", file=stderr)
+			exit(1)
+
+		root = tk.Tk()
+		dashboard = Dashboard(root, nodes)
+		root.mainloop()
+		dashboard.stop()
+		exit(0)
+
 	# automates the process of copying the auth token
 	def auth_token_setup():
 		if getuid() != 0:
@@ -798,37 +4669,64 @@ if __name__ == "__main__":
 			else:
 				_exit(0)
 
-	# temporary window for popups
-	tmp = tk.Tk()
-	tmp.withdraw()
-
-	# simple check for zerotier
-	try:
-		check_output(['zerotier-cli', 'listnetworks'], stderr=STDOUT)
-
-	# in case the command throws an error
-	except CalledProcessError as error:
+	# the only tk root, hidden until the main window is built on it
+	root = tk.Tk()
+	root.withdraw()
+
+	api = ZeroTierAPI()
+	privilegedHelper = PrivilegedHelper() if arguments.privileged_helper else None
+
+	# the window is up before zerotier has even been asked, showing
+	# the snapshot from the last run or no networks until it answers
+	cached = None if arguments.no_cache else load_snapshot_cache()
+	mainWindow = MainWindow(cacheTtl=arguments.cache_ttl, window=root, api=api,
+		networks=[] if cached is None else None, linkWatch=not arguments.no_link_watch,
+		cached=cached, saveCache=not arguments.no_cache, privilegedHelper=privilegedHelper)
+	root.deiconify()
+
+	if arguments.startup_timing and cached is not None:
+		root.update()
+		print(f"time to first paint: {(perf_counter() - startTime) * 1000:.1f} ms (cached)", file=stderr)
+	elif arguments.startup_timing:
+		# the first expose event is the first time anything is painted
+		def report_first_paint(event):
+			root.unbind('<Expose>')
+			print(f"time to first paint: {(perf_counter() - startTime) * 1000:.1f} ms", file=stderr)
+
+		root.bind('<Expose>', report_first_paint)
+
+	# a failed first check for zerotier, exits unless it can be fixed
+	def probe_failed(error):
+
+		# in case there's no command
+		if isinstance(error, FileNotFoundError):
+			messagebox.showinfo(title="Error",
+				message="ZeroTier isn't installed!", icon="error")
+			_exit(1)
 
-		output = error.output.decode()
+		# in case the service or zerotier-cli throws an error
+		output = str(error)
 
 		if "missing authentication token" in output:
 			messagebox.showinfo(title="Error",
 				message="This user doesn't have access to ZeroTier!", icon="error")
 			auth_token_setup()
+			api.token = api.read_token()
 		elif "Error connecting" in output:
 			messagebox.showinfo(title="Error",
 				message='"zerotier-one" service isn\'t running!', icon="error")
 			_exit(1)
 
-	# in case there's no command
-	except FileNotFoundError:
-		messagebox.showinfo(title="Error",
-			message="ZeroTier isn't installed!", icon="error")
-		_exit(1)
+	# simple check for zerotier, its answer is the first snapshot. it's
+	# asked in the background, so a service or zerotier-cli that hangs
+	# only ends in the engine's timeout instead of a frozen window
+	def probed(results):
+		networks = results['networks']
+		if isinstance(networks, Exception):
+			probe_failed(networks)
+			networks = None
+		mainWindow.load_networks(networks)
 
-	# destroy temporary window
-	tmp.destroy()
+	mainWindow.engine.submit({'networks': api.get_networks}, probed)
 
-	# create mainwindow class and execute the mainloop
-	mainWindow = MainWindow().window
-	mainWindow.mainloop()
+	root.mainloop()